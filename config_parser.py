@@ -1,33 +1,153 @@
-import configparser
-from os import makedirs
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from os import makedirs, path, stat
+import numpy as np
+
+_SECTION_RE = re.compile(r'^\[(.+)\]$')
+_ENTRY_RE = re.compile(r'^([^=]+)=(.*)$')
+_INTERPOLATION_RE = re.compile(r'\$\{([^}]+)\}')
+#same limit of the nested references of configparser
+_MAX_INTERPOLATION_DEPTH = 10
+
+_POSITIVE_PARAMETERS = (
+    ('NSTEPS', 'The number of MonteCarlo steps must be > 0 but is {}'),
+    ('OMEGA', 'The phonon frequency must be > 0.0 but is {}'),
+    ('G', 'The intensity of electron phonon coupling must be > 0.0 but is {}'),
+    ('TIME', 'The lifetime of the electron must be > 0.0 but is {}'))
+
+_BOOLEAN_STATES = {'1': True, 'yes': True, 'true': True, 'on': True,
+                   '0': False, 'no': False, 'false': False, 'off': False}
+
+def _read_config_file(filename : str) -> dict[str, dict[str, str]]:
+    """This function reads a configuration file and stores its content
+    in a nested dictionary {section : {key : value}}.
+    References to other keys written as ${KEY} (same section) or
+    ${section:KEY} are resolved while the file is parsed.
+    The keys are case-insensitive as in configparser and they are
+    stored upper-case
+
+    Parameters:
+        filename: name of the configuration file with the values
+
+    Return:
+        dictionary with a dictionary of str values for each section
+
+    Raises:
+        ValueError: if a reference names a missing section or key or
+            the references are nested more than _MAX_INTERPOLATION_DEPTH
+            times, e.g. because they form a cycle
+    """
+    config = {}
+    section = None
+    with open(filename) as file:
+        for line in file:
+            line = line.strip()
+            if not line or line[0] in '#;':
+                continue
+            match = _SECTION_RE.match(line)
+            if match:
+                section = config.setdefault(match.group(1).strip(), {})
+                continue
+            match = _ENTRY_RE.match(line)
+            if match and section is not None:
+                section[match.group(1).strip().upper()] = match.group(2).strip()
+
+    def interpolate(option : str, section : str, key : str, depth : int) -> str:
+        if depth > _MAX_INTERPOLATION_DEPTH:
+            raise ValueError(f'The references of {option} are nested more than '
+                             f'{_MAX_INTERPOLATION_DEPTH} times, '
+                             f'the last one is ${{{section}:{key}}}')
+
+        def replace(match : re.Match) -> str:
+            reference_section, _, reference_key = match.group(1).rpartition(':')
+            reference_section = reference_section or section
+            reference_key = reference_key.strip().upper()
+            if reference_key not in config.get(reference_section, {}):
+                raise ValueError(f'The reference {match.group(0)} of {option} '
+                                 f'does not match any key of section [{reference_section}]')
+            return interpolate(option, reference_section, reference_key, depth + 1)
+
+        return _INTERPOLATION_RE.sub(replace, config[section][key])
+
+    for section_name, entries in config.items():
+        for key in entries:
+            entries[key] = interpolate(f'[{section_name}] {key}', section_name, key, 0)
+
+    return config
+
+def _getboolean(value : str) -> bool:
+    """This function converts a value of the configuration file
+    to a boolean accepting the same values of configparser
+    (1/0, yes/no, true/false, on/off)
+
+    Raises:
+        ValueError: if the value is not a valid boolean
+    """
+    if value.lower() not in _BOOLEAN_STATES:
+        raise ValueError(f'Not a boolean: {value}')
+    return _BOOLEAN_STATES[value.lower()]
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """This class stores the physical and technical parameters
+    for the simulation already cast to their type
+
+    Attributes:
+        NSTEPS: number of MonteCarlo steps
+        NSTEPS_BURN: number of steps for thermalization
+        OMEGA: frequency of phonons
+        G: electron-phonon coupling
+        TIME: lifetime of the electron
+        INTERACTIVE: whether the plot is also shown on screen
+    """
+    NSTEPS : int
+    NSTEPS_BURN : int
+    OMEGA : float
+    G : float
+    TIME : float
+    INTERACTIVE : bool
 
 class Config:
     def __init__(self, filename : str):
-        """This function creates a ConfigParser object that can read
-        data from a configuration file
+        """This function reads the configuration file once and stores
+        the dictionaries with the values cast to the proper type, so
+        that the get_* methods do not parse the file again
         
         Parameters:
             filename: name of the configuration file with the values
         """
-        self.config = configparser.ConfigParser(interpolation=configparser.ExtendedInterpolation())
-        self.config.read(filename)
+        config = _read_config_file(filename)
+
+        settings = config['settings']
+        self._settings = Settings(NSTEPS=int(settings['NSTEPS']),
+                                  NSTEPS_BURN=int(settings['NSTEPS_BURN']),
+                                  OMEGA=float(settings['OMEGA']),
+                                  G=float(settings['G']),
+                                  TIME=float(settings['TIME']),
+                                  INTERACTIVE=_getboolean(settings['INTERACTIVE']))
+
+        seed = config['seed']['SEED']
+        self._seed = {'SEED' : None if seed == "" else int(seed)}
 
-    def get_settings(self) -> dict[str, int | float | bool]:
-        """This function stores in a dictionary the physical and technical 
+        self._path_plot = {'PLOT_FOLDER' : config['path_plot']['PLOT_FOLDER'],
+                           'PHONONS' : config['path_plot']['PHONONS']}
+
+        self._path_data = {'DATA_FOLDER' : config['path_data']['DATA_FOLDER'],
+                           'ENERGY+PHONONS' : config['path_data']['ENERGY+PHONONS'],
+                           'APPEND' : _getboolean(config['path_data']['APPEND'])}
+
+    def get_settings(self) -> Settings:
+        """This function returns the physical and technical 
         parameters for the simulation
         
         Return:
-            dictionary with relevant parameters for the simulation
+            frozen Settings object with relevant parameters for the simulation
         """
-        return {'NSTEPS' : int(self.config.get('settings', 'NSTEPS')),
-                'NSTEPS_BURN' : int(self.config.get('settings', 'NSTEPS_BURN')),
-                'OMEGA' : float(self.config.get('settings', 'OMEGA')),
-                'G' : float(self.config.get('settings', 'G')),
-                'TIME' : float(self.config.get('settings', 'TIME')),
-                'INTERACTIVE' : self.config.getboolean('settings', 'INTERACTIVE')}
+        return self._settings
     
     def get_seed(self) -> dict[str, int | None]:
-        """This function stores in a dictionary the seed of the random
+        """This function returns a dictionary with the seed of the random
         number generator used in the simulation.
         It either stores the value read from the configuration file or None
         of no value is provided
@@ -35,41 +155,71 @@ class Config:
         Return:
             dictionary with the seed for random 
         """ 
-        if self.config.get('seed', 'SEED') == "" :
-          return {'SEED' : None}
-        else:
-            return {'SEED' : self.config.get('seed', 'SEED')}
+        return dict(self._seed)
            
     def get_path_plot(self) -> dict[str, str]:
-        """This function stores in a dictionary the path to save plots
+        """This function returns a dictionary with the path to save plots
         
         Return:
             dictionary that stores str identifiers and the path to store
             the corresponding plot
         """
-        return {'PLOT_FOLDER' : self.config.get('path_plot', 'PLOT_FOLDER'),
-                'PHONONS' : self.config.get('path_plot', 'PHONONS')}
+        return dict(self._path_plot)
     
     def get_path_data(self) -> dict[str, str | bool]:
-        """This function stores in a dictionary the path and features 
+        """This function returns a dictionary with the path and features 
         to save relevant data from the simulation
         
         Return:
             dictionary that stores str identifiers path and mode to store
             the corresponding data
         """
-        return {'DATA_FOLDER' : self.config.get('path_data', 'DATA_FOLDER'), 
-                'ENERGY+PHONONS' : self.config.get('path_data', 'ENERGY+PHONONS'),
-                'APPEND' : self.config.getboolean('path_data', 'APPEND')}
+        return dict(self._path_data)
+
+@lru_cache(maxsize=8)
+def _load_config_version(filename : str, mtime_ns : int) -> Config:
+    """This function parses a version of a configuration file
+
+    Parameters:
+        filename: absolute path of the configuration file
+        mtime_ns: modification time of the file, used only as a key
+            of the cache
 
-def check_positive_parameters(settings : dict[str, str | bool]):
+    Return:
+        config object of the file
+    """
+    return Config(filename)
+
+def load_config(filename : str) -> Config:
+    """This function returns the Config object of a configuration
+    file parsing the file only at the first call for each version
+    of the file
+
+    Parameters:
+        filename: name of the configuration file with the values
+
+    Return:
+        config object shared by all the calls with the same file
+        until it is modified
+    ------------------------
+    Notes:
+    The objects are cached by absolute path and modification time, so
+    the same file reached through different names is parsed once and an
+    edited file is parsed again.
+    The object can be shared because the settings are frozen and the
+    other get_* methods return copies of the stored dictionaries
+    """
+    filename = path.abspath(filename)
+    return _load_config_version(filename, stat(filename).st_mtime_ns)
+
+def check_positive_parameters(settings : Settings):
     """This function checks that the relevant parameters for the simulation are positive.
        
        It collects all the strings relative to invalid parameters that would lead to a
        nonsensical simulation if presents and raise a ValueError stating all the invalid ones.
     
         Parameters:
-            settings: dictionary that contains relevant parameters for the simulation
+            settings: Settings object that contains relevant parameters for the simulation
         
         Raises:
             ValueError: if any of the following conditions are met:
@@ -78,16 +228,10 @@ def check_positive_parameters(settings : dict[str, str | bool]):
                 - G (intensity e-ph coupling) : not greater than 0.0
                 - TIME (lifetime of the electron) : not greater than 0.0
     """
-    invalid_parameters = []
-    if settings['NSTEPS'] <= 0:
-        invalid_parameters.append(f'The number of MonteCarlo steps must be > 0 but is {settings["""NSTEPS"""]}')
-    if settings['OMEGA'] <= 0.0:
-        invalid_parameters.append(f'The phonon frequency must be > 0.0 but is {settings["""OMEGA"""]}')
-    if settings['G'] <= 0.0:
-        invalid_parameters.append(f'The intensity of electron phonon coupling must be > 0.0 but is {settings["""G"""]}')
-    if settings['TIME'] <= 0.0:
-        invalid_parameters.append(f'The lifetime of the electron must be > 0.0 but is {settings["""TIME"""]}')
-    
+    values = [getattr(settings, name) for name, _ in _POSITIVE_PARAMETERS]
+    invalid = np.flatnonzero(np.array(values, dtype=np.float64) <= 0.0)
+    invalid_parameters = [_POSITIVE_PARAMETERS[i][1].format(values[i]) for i in invalid]
+
     if invalid_parameters:
         raise ValueError('\n'.join(invalid_parameters))
 
@@ -101,6 +245,8 @@ def ensure_storage_directories_exist(path_plot : dict[str,str],
             path_plot: dictionary with the path to store plot
             path_data: dictionary with the path to store data
     """
-    makedirs(path_plot['PLOT_FOLDER'], exist_ok=True)
-    makedirs(path_data['DATA_FOLDER'], exist_ok=True)
+    for folder in (path_plot['PLOT_FOLDER'], path_data['DATA_FOLDER']):
+        #skip the mkdir syscall in the common case of an existing directory
+        if not path.isdir(folder):
+            makedirs(folder, exist_ok=True)
 
@@ -0,0 +1,64 @@
+import pytest
+import numpy as np
+import kernels
+from config_parser import load_config
+from polaron import Polaron
+
+@pytest.fixture(scope="session", autouse=True)
+def compiled_kernels():
+    """This method compiles all the kernels once at the start of
+    the test session
+
+    Notes:
+    The kernels are cached on disk, so only the first session pays
+    the compilation time and no test pays it in the middle of its run
+    """
+    kernels.compile_kernels()
+
+@pytest.fixture(scope="session")
+def shared_config():
+    """This method returns a config object parsed once from the
+    test configuration file and shared by all the tests
+
+    Return:
+        config object of configuration_test.txt
+
+    Notes:
+    The settings are frozen and the get_* methods return copies
+    of the stored dictionaries, so the tests cannot modify the
+    shared object
+    """
+    return load_config('configuration_test.txt')
+
+@pytest.fixture(scope="session")
+def shared_polaron():
+    """This method builds once for the whole test session the
+    polaron object reused by the polaron fixture
+
+    Return:
+        polaron object with zero order
+    """
+    return Polaron(omega=1.0, g=0.5, time=10.0)
+
+@pytest.fixture
+def polaron(shared_polaron):
+    """This method returns a fixed polaron object
+    that can be used consistently during the tests
+
+    Parameters:
+        shared_polaron: fixture shared_polaron
+
+    Return:
+        polaron object with zero order and a random number
+        generator seeded with 1
+
+    Notes:
+    The shared object is reset before each test and gets a new
+    generator, since reset keeps the generator of the polaron.
+    So neither the diagram nor the state of the generator (or a
+    scripted one installed by a test) affect the next tests, whatever
+    their order
+    """
+    shared_polaron.reset()
+    shared_polaron.rng = np.random.default_rng(1)
+    return shared_polaron
@@ -6,6 +6,24 @@ Holstein polaron.
 import numpy as np
 from polaron import Polaron
 
+def _draw_coin_flips(rng : np.random.Generator, nsteps : int) -> np.ndarray:
+    """This function draws the fair coin flips that choose the update
+    at each MonteCarlo step
+
+    Parameters:
+     rng : random number generator of the simulation
+     nsteps : number of coin flips to draw
+
+    Return:
+        array of nsteps values equal to 0 or 1
+    ------------------------
+    Notes:
+    The flips are the bits of nsteps/8 random bytes, so a single
+    byte of entropy is drawn every 8 steps
+    """
+    random_bytes = np.frombuffer(rng.bytes((nsteps + 7) // 8), dtype=np.uint8)
+    return np.unpackbits(random_bytes)[:nsteps]
+
 def run_thermalization_steps(polaron : Polaron, nsteps_burn : int) -> Polaron :
     """This function run some steps previous MonteCarlo steps 
     to thermalize the Markov chain
@@ -20,42 +38,50 @@ def run_thermalization_steps(polaron : Polaron, nsteps_burn : int) -> Polaron :
     ------------------------
     Notes:
     These steps are used to thermalize the Markov chain so the observables
-    are not stored 
+    are not stored.
+    The choice between the two updates is drawn for all the steps with a
+    single call to the random number generator of the polaron and the
+    steps are run by the compiled kernel of the polaron
     """
-    for _ in range(nsteps_burn):
-        if polaron.diagram['order'] == 0:
-            polaron.eval_add_internal()
-        else:
-            number = np.random.randint(2)
-            if number == 0:
-                polaron.eval_add_internal()
-            else:
-                polaron.eval_remove_internal()
+    polaron.run_burnin(_draw_coin_flips(polaron.rng, nsteps_burn))
 
     return polaron
 
-def run_diagrammatic_montecarlo(polaron : Polaron, nsteps : int) :
+def run_diagrammatic_montecarlo(polaron : Polaron, nsteps : int, thin : int = 1,
+                                out_path : str | None = None,
+                                energy_dtype : type = np.float64) :
     """This function run the steps of the MonteCarlo simulation
     
     Parameters:
      polaron : polaron object with the diagram and other features
      nsteps : number of MonteCarlo steps employed  in the simulation
+     thin : number of steps between two stored diagrams, by default
+        every diagram is stored
+     out_path : if provided the sequences are memory-mapped to the files
+        out_path.order and out_path.energy, otherwise they are kept in memory
+     energy_dtype : floating point type of the stored energies, np.float32
+        halves the memory of the energy sequence
 
     Return:
-        tuple(list,list) that contains the sequences of orders and energies
-        of each diagram sampled in the simulation
+        tuple(np.ndarray,np.ndarray) that contains the sequences of orders
+        and energies of each diagram sampled in the simulation
+
+    Raises:
+        ValueError: if thin is smaller than 1
+    ------------------------
+    Notes:
+    The choice between the two updates is drawn for all the steps with a
+    single call to the random number generator of the polaron, the sequences are
+    preallocated with the number of stored diagrams nsteps//thin and filled
+    by the compiled kernel of the polaron
     """
-    for _ in range(nsteps):
-        if polaron.diagram['order'] == 0:
-            polaron.eval_add_internal()
-        else:
-            number = np.random.randint(2)
-            if number == 0:
-                polaron.eval_add_internal()
-            else:
-                polaron.eval_remove_internal()
-
-        polaron.eval_diagram_energy()
-        polaron.update_diagrams_info()
+    if thin < 1:
+        raise ValueError(f'The number of steps between two stored diagrams must be >= 1 but is {thin}')
+
+    polaron.set_starting_info(nsteps // thin, out_path, energy_dtype)
+    polaron.run_production(_draw_coin_flips(polaron.rng, nsteps), thin)
+    if out_path is not None:
+        polaron.order_sequence.flush()
+        polaron.energy_sequence.flush()
 
     return (polaron.order_sequence, polaron.energy_sequence)
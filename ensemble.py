@@ -0,0 +1,243 @@
+import numpy as np
+import numba
+import kernels
+from kernels import INITIAL_CAPACITY
+
+class PolaronEnsemble:
+    """This class contains an ensemble of independent Markov chains for the
+    same Holstein polaron and performs the MonteCarlo updates of all the
+    chains at once with array operations.
+
+    Attributes
+    ----------
+    nchains :
+        Number of independent Markov chains
+
+    g, omega, time :
+        Parameters of the polaron shared by all the chains
+
+    order :
+        array with the order of the current diagram of each chain
+
+    total_energy :
+        array with the energy of the current diagram of each chain
+        evaluated through the estimator
+
+    gen_times, rem_times :
+        preallocated arrays of shape (nchains, capacity) whose first
+        n_phonons[k] entries in the row k store the generation and removal
+        time of the phonons of the chain k
+
+    n_phonons :
+        array with the number of phonons of the current diagram of each chain
+
+    order_sequence, energy_sequence :
+        preallocated arrays of shape (nsteps, nchains) with the order and
+        energy of the diagrams sampled by each chain
+
+    rng :
+        random number generator used to sample the updates
+
+    Methods
+    -------
+    step():
+        perform one MonteCarlo step, either an add or a remove update,
+        for each of the chains
+
+    eval_diagram_energy():
+        evaluate the energy of the current diagram of each chain
+
+    set_starting_info(nsteps):
+        allocate the arrays for the order and energy sequences
+
+    update_diagrams_info():
+        store the order and energy of the current diagrams in the
+        next row of the order and energy sequences
+
+    run_steps(nsteps, measure):
+        perform nsteps MonteCarlo steps, eventually storing the
+        sampled diagrams
+    """
+
+    __slots__ = ('nchains', 'omega', 'g', 'time', 'order', 'total_energy',
+                 '_pos_tau_omega', '_neg_tau_omega', '_scaling', '_inv_scaling',
+                 'gen_times', 'rem_times', 'n_phonons', '_interaction_time_sum',
+                 'order_sequence', 'energy_sequence', '_step', 'rng')
+
+    def __init__(self, nchains : int, omega : float, g : float, time : float,
+                 rng : np.random.Generator | None = None):
+        """This function builds nchains empty diagrams with the parameters
+        of the polaron and the preallocated arrays for their phonons
+
+        Parameters:
+            nchains : number of independent Markov chains
+            omega : frequency of the phonons
+            g : intensity of electron-phonon coupling
+            time : lifetime of the electron
+            rng : random number generator, a new one with a random seed
+                is created if not provided
+        """
+        self.nchains = nchains
+        self.omega = omega
+        self.g = g
+        self.time = time
+        self.order = np.zeros(nchains, dtype=np.int64)
+        self.total_energy = np.zeros(nchains, dtype=np.float64)
+
+        #constant factors of the weight ratios
+        self._pos_tau_omega = time*omega
+        self._neg_tau_omega = -self._pos_tau_omega
+        self._scaling = (g*time)**2
+        self._inv_scaling = 1.0/self._scaling
+
+        self.gen_times = np.zeros((nchains, INITIAL_CAPACITY), dtype=np.float64)
+        self.rem_times = np.zeros((nchains, INITIAL_CAPACITY), dtype=np.float64)
+        self.n_phonons = np.zeros(nchains, dtype=np.int64)
+        self._interaction_time_sum = np.zeros(nchains, dtype=np.float64)
+        self.order_sequence = np.empty((0, nchains), dtype=np.int32)
+        self.energy_sequence = np.empty((0, nchains), dtype=np.float64)
+        self._step = 0
+
+        self.rng = np.random.default_rng() if rng is None else rng
+
+    def step(self):
+        """This method performs one MonteCarlo step for each of the chains
+
+        For every chain a coin flip chooses between the add and the remove
+        update (only add at order 0) and both proposals are evaluated as
+        arrays over the chains; the accepted ones are then applied with
+        masked scatters to the arrays of phonons.
+
+        Notes:
+        The removed phonon is replaced by the last one of the chain since
+        the phonon to remove is chosen uniformly and the order of the
+        phonons is irrelevant.
+        The sum of the interaction times of each chain is updated with the
+        added or removed phonons and set exactly to 0 for the empty diagrams.
+        """
+        rows = np.arange(self.nchains)
+        n_phonons = self.n_phonons
+        uniforms = self.rng.random((self.nchains, 3))
+        remove = (self.rng.integers(0, 2, self.nchains) == 1) & (n_phonons > 0)
+
+        with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+            #proposal for the add update
+            t_gen = uniforms[:, 0]
+            t_rem = t_gen + (1.0 - t_gen)*uniforms[:, 1]
+            ratio_add = self._scaling*np.exp(self._neg_tau_omega*(t_rem - t_gen)) \
+                        * np.where(n_phonons == 0, 0.5, 1.0)*(1.0 - t_gen)/(n_phonons + 1)
+
+            #proposal for the remove update
+            index = np.minimum((uniforms[:, 0]*n_phonons).astype(np.int64),
+                               np.maximum(n_phonons - 1, 0))
+            t_gen_chosen = self.gen_times[rows, index]
+            t_rem_chosen = self.rem_times[rows, index]
+            ratio_remove = self._inv_scaling*np.exp(self._pos_tau_omega*(t_rem_chosen - t_gen_chosen)) \
+                        * np.where(n_phonons == 1, 2.0, 1.0)*n_phonons/(1.0 - t_gen_chosen)
+
+        accepted_add = np.flatnonzero(~remove & (uniforms[:, 2] < ratio_add))
+        accepted_remove = np.flatnonzero(remove & (uniforms[:, 2] < ratio_remove))
+
+        if accepted_add.size and n_phonons[accepted_add].max() == self.gen_times.shape[1]:
+            self.gen_times = np.concatenate((self.gen_times, np.zeros_like(self.gen_times)), axis=1)
+            self.rem_times = np.concatenate((self.rem_times, np.zeros_like(self.rem_times)), axis=1)
+
+        last = n_phonons[accepted_add]
+        self.gen_times[accepted_add, last] = t_gen[accepted_add]
+        self.rem_times[accepted_add, last] = t_rem[accepted_add]
+        n_phonons[accepted_add] += 1
+        self._interaction_time_sum[accepted_add] += t_rem[accepted_add] - t_gen[accepted_add]
+
+        last = n_phonons[accepted_remove] - 1
+        chosen = index[accepted_remove]
+        self.gen_times[accepted_remove, chosen] = self.gen_times[accepted_remove, last]
+        self.rem_times[accepted_remove, chosen] = self.rem_times[accepted_remove, last]
+        n_phonons[accepted_remove] -= 1
+        self._interaction_time_sum[accepted_remove] -= t_rem_chosen[accepted_remove] \
+                                                       - t_gen_chosen[accepted_remove]
+        self._interaction_time_sum[n_phonons == 0] = 0.0
+
+        self.order = 2*n_phonons
+
+    def eval_diagram_energy(self):
+        """This method evaluates the energy of the current diagram of each
+        chain using the formula of the estimator
+
+        Notes:
+        The sums of the interaction times are kept up to date by step,
+        so no sum over the phonons of the chains is needed
+        """
+        self.total_energy = self.omega*self._interaction_time_sum - self.order/self.time
+
+    def set_starting_info(self, nsteps : int):
+        """This method allocates the arrays that store the order and
+        energy of the diagrams sampled by each chain
+
+        Parameters:
+            nsteps : number of diagrams that will be sampled by each chain
+        """
+        self.order_sequence = np.empty((nsteps, self.nchains), dtype=np.int32)
+        self.energy_sequence = np.empty((nsteps, self.nchains), dtype=np.float64)
+        self._step = 0
+
+    def update_diagrams_info(self):
+        """This method stores the order and energy of the current diagrams
+        in the next row of the arrays of diagrams order and energy
+        """
+        self.order_sequence[self._step] = self.order
+        self.energy_sequence[self._step] = self.total_energy
+        self._step += 1
+
+    def run_steps(self, nsteps : int, measure : bool = False):
+        """This method performs nsteps MonteCarlo steps for all the chains
+
+        Parameters:
+            nsteps : number of MonteCarlo steps
+            measure : if True the energy and order of the diagrams after each
+                step are stored in the next rows of the order and energy
+                sequences, that have to be allocated by set_starting_info
+        """
+        for _ in range(nsteps):
+            self.step()
+            if measure:
+                self.eval_diagram_energy()
+                self.update_diagrams_info()
+
+def run_parallel_chains(nchains : int, omega : float, g : float, time : float,
+                        nsteps_burn : int, nsteps : int,
+                        rng : np.random.Generator | None = None,
+                        num_threads : int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """This function runs independent Markov chains of the same polaron
+    in parallel threads with the compiled kernel
+
+    Parameters:
+        nchains : number of independent Markov chains
+        omega, g, time : parameters of the polaron
+        nsteps_burn : number of steps to thermalize each chain
+        nsteps : number of sampled diagrams of each chain
+        rng : random number generator that draws the seed of each chain,
+            a new one with a random seed is created if not provided
+        num_threads : number of threads that run the chains, by default
+            all the threads available to Numba are used
+
+    Return:
+        tuple of arrays of shape (nchains, nsteps) with the order and
+        energy of the diagrams sampled by each chain
+    ------------------------
+    Notes:
+    Each chain writes a contiguous row of the sequences, so the threads
+    never write to the same cache lines.
+    The chains depend only on their seeds, so the sampled sequences do not
+    depend on the number of threads.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    seeds = rng.integers(0, 2**32, nchains, dtype=np.uint32)
+    if num_threads is None:
+        return kernels.run_chains(seeds, nsteps_burn, nsteps, omega, g, time)
+
+    previous_num_threads = numba.get_num_threads()
+    numba.set_num_threads(num_threads)
+    try:
+        return kernels.run_chains(seeds, nsteps_burn, nsteps, omega, g, time)
+    finally:
+        numba.set_num_threads(previous_num_threads)
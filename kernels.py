@@ -0,0 +1,471 @@
+"""
+Numba kernels for the updates of the diagrammatic MonteCarlo simulation
+of the Holstein polaron.
+
+The functions work on plain scalars and on the preallocated arrays with
+the generation and removal times of the phonons of a Polaron object, so
+that the whole Markov chain can be run in nopython mode without going
+back to the interpreter at each step.
+"""
+
+from math import exp, log
+import numpy as np
+from numba import njit, prange
+
+#number of steps whose uniform random numbers are drawn with a single call
+_RANDOM_BATCH = 65536
+#starting capacity of the arrays of phonon times
+INITIAL_CAPACITY = 16
+#number of steps after which the incremental interaction time is summed again
+_RESUM_PERIOD = 1 << 20
+
+@njit(cache=True)
+def metropolis(prob : float) -> float:
+    """This function uses the Metropolis choice for the
+        detailed balance of the Markov chain
+
+    Parameters:
+        prob : ratio between the acceptance probability for an update
+            and its reverse
+
+    Return:
+        minimum between one and the ratio of acceptance probabilities
+    """
+    return min(1.0, prob)
+
+@njit(cache=True)
+def weigth_ratio_add(t_gen : float, t_rem : float, neg_tau_omega : float,
+                     scaling : float) -> float:
+    """This function evaluates the ratio between the proposed diagram
+    with an additional phonon and the current one
+
+    Parameters:
+        t_gen, t_rem : generation and removal time of the proposed phonon
+        neg_tau_omega : -time*omega of the polaron
+        scaling : (g*time)**2 of the polaron
+
+    Return:
+        scaling factor due to imaginary scaled times multiplied by the
+        contribution of a phonon propagator
+    """
+    return scaling * exp(neg_tau_omega*(t_rem - t_gen))
+
+@njit(cache=True)
+def log_weigth_ratio_add(t_gen : float, t_rem : float, neg_tau_omega : float,
+                         log_scaling : float) -> float:
+    """This function evaluates the logarithm of the ratio between the
+    proposed diagram with an additional phonon and the current one
+
+    Parameters:
+        t_gen, t_rem : generation and removal time of the proposed phonon
+        neg_tau_omega : -time*omega of the polaron
+        log_scaling : logarithm of (g*time)**2 of the polaron
+
+    Return:
+        logarithm of the scaling factor due to imaginary scaled times
+        multiplied by the contribution of a phonon propagator
+    """
+    return log_scaling + neg_tau_omega*(t_rem - t_gen)
+
+@njit(cache=True)
+def proposal_add_ratio(t_gen : float, order : int, n_phonons : int) -> float:
+    """This function evaluates the ratio between the proposal probability
+    of removing the proposed phonon and the one of adding it
+
+    Parameters:
+        t_gen : generation time of the proposed phonon
+        order : order of the current diagram
+        n_phonons : number of phonons in the current diagram
+
+    Return:
+        ratio between proposal probability for the reverse update and
+        the direct one, with a prefactor 1/2 at order 0
+    ------------------------
+    Notes:
+    The prefactor is selected arithmetically from the comparison, so there
+    is no branch on the order that is almost always different from 0
+    """
+    return (1.0 - 0.5*(order == 0))*(1 - t_gen)/(n_phonons + 1)
+
+@njit(cache=True)
+def weigth_ratio_remove(t_gen : float, t_rem : float, pos_tau_omega : float,
+                        inv_scaling : float) -> float:
+    """This function evaluates the ratio between the proposed diagram
+    with one less phonon and the current one
+
+    Parameters:
+        t_gen, t_rem : generation and removal time of the chosen phonon
+        pos_tau_omega : time*omega of the polaron
+        inv_scaling : 1/(g*time)**2 of the polaron
+
+    Return:
+        reciprocal of a phonon propagator divided by the scaling factor
+        due to imaginary scaled times
+    """
+    return exp(pos_tau_omega*(t_rem - t_gen)) * inv_scaling
+
+@njit(cache=True)
+def log_weigth_ratio_remove(t_gen : float, t_rem : float, pos_tau_omega : float,
+                            log_scaling : float) -> float:
+    """This function evaluates the logarithm of the ratio between the
+    proposed diagram with one less phonon and the current one
+
+    Parameters:
+        t_gen, t_rem : generation and removal time of the chosen phonon
+        pos_tau_omega : time*omega of the polaron
+        log_scaling : logarithm of (g*time)**2 of the polaron
+
+    Return:
+        logarithm of the reciprocal of a phonon propagator divided by
+        the scaling factor due to imaginary scaled times
+    """
+    return pos_tau_omega*(t_rem - t_gen) - log_scaling
+
+@njit(cache=True)
+def proposal_remove_ratio(t_gen : float, order : int, n_phonons : int) -> float:
+    """This function evaluates the ratio between the proposal probability
+    of adding back the chosen phonon and the one of removing it
+
+    Parameters:
+        t_gen : generation time of the chosen phonon
+        order : order of the current diagram
+        n_phonons : number of phonons in the current diagram
+
+    Return:
+        ratio between proposal probability for the reverse update and
+        the direct one, with a prefactor 2 at order 2
+    ------------------------
+    Notes:
+    The prefactor is selected arithmetically from the comparison, so there
+    is no branch on the order that is almost always different from 2
+    """
+    return (1.0 + (order == 2))*n_phonons/(1 - t_gen)
+
+@njit(cache=True)
+def interaction_time(gen_times : np.ndarray, rem_times : np.ndarray,
+                     n_phonons : int) -> float:
+    """This function sums the interaction times of the phonons of a diagram
+
+    Parameters:
+        gen_times, rem_times : arrays whose first n_phonons entries store
+            the generation and removal times of the phonons
+        n_phonons : number of phonons in the diagram
+
+    Return:
+        sum of the differences between removal and generation times
+    """
+    return (rem_times[:n_phonons] - gen_times[:n_phonons]).sum()
+
+@njit(cache=True)
+def estimator_energy(interaction_time_sum : float, order : int,
+                     omega : float, time : float) -> float:
+    """This function evaluates the energy of a diagram through the estimator
+
+    Parameters:
+        interaction_time_sum : sum of the interaction times of the phonons
+        order, omega, time : order of the diagram and parameters of the polaron
+
+    Return:
+        energy of the diagram
+    """
+    if order == 0:
+        return 0.0
+    return omega*interaction_time_sum - order/time
+
+@njit(cache=True)
+def diagram_energy(gen_times : np.ndarray, rem_times : np.ndarray, n_phonons : int,
+                   order : int, omega : float, time : float) -> float:
+    """This function evaluates the energy of a diagram through the estimator
+    summing again the interaction times of all its phonons
+
+    Parameters:
+        gen_times, rem_times : arrays whose first n_phonons entries store
+            the generation and removal times of the phonons
+        n_phonons : number of phonons in the diagram
+        order, omega, time : order of the diagram and parameters of the polaron
+
+    Return:
+        energy of the diagram
+    """
+    return estimator_energy(interaction_time(gen_times, rem_times, n_phonons),
+                            order, omega, time)
+
+@njit(cache=True)
+def grow_times(times : np.ndarray) -> np.ndarray:
+    """This function doubles the capacity of an array of phonon times
+
+    Parameters:
+        times : array with the generation or removal times of the phonons
+
+    Return:
+        array with twice the capacity starting with the same times
+    """
+    grown = np.empty(2*times.shape[0])
+    grown[:times.shape[0]] = times
+    return grown
+
+@njit(cache=True)
+def mc_step(coin, u0, u1, sample, gen_times, rem_times, n_phonons, order,
+            interaction_time_sum, pos_tau_omega, neg_tau_omega, scaling, inv_scaling):
+    """This function performs one MonteCarlo step of a Markov chain
+
+    Parameters:
+        coin : 0 (add phonon) or 1 (remove phonon) flip
+        u0, u1, sample : uniform random numbers in [0, 1) for the step
+        gen_times, rem_times : arrays with the generation and removal times
+            of the phonons of the diagram
+        n_phonons, order : current state of the diagram
+        interaction_time_sum : sum of the interaction times of the phonons
+        pos_tau_omega, neg_tau_omega, scaling, inv_scaling : constant factors
+            of the weight ratios of the polaron
+
+    Return:
+        tuple with the (possibly grown) arrays of generation and removal
+        times, the number of phonons, the order and the sum of the
+        interaction times of the updated diagram
+    ------------------------
+    Notes:
+    At order 0 only the add update is possible so the coin flip is
+    masked to 0. The removed phonon is replaced by the last one, since
+    the phonon to remove is chosen uniformly the order of the phonons
+    is irrelevant.
+    For the add update the uniforms give the generation time, the removal
+    time between it and 1 and the Metropolis sample, for the remove update
+    the index of the phonon and the Metropolis sample.
+    An update is accepted iff the sample is below the ratio of the acceptance
+    probabilities: since the sample is in [0, 1) this is the Metropolis choice
+    min(1, ratio) without the min and the branch on ratio >= 1.
+    When the bound of the propagator does not already decide the outcome,
+    the comparison is done in log-space between log(sample/bound) and the
+    exponent of the propagator, so no exponential is evaluated and the
+    inverse propagator of long phonons never overflows.
+    The sum of the interaction times is updated with the added or removed
+    phonon and it is set exactly to 0 when the diagram is left empty.
+    """
+    if coin == 0 or order == 0:
+        t_gen = u0
+        t_rem = t_gen + (1.0 - t_gen)*u1
+        #the phonon propagator is <= 1 so the ratio is bounded from above
+        upper = scaling*proposal_add_ratio(t_gen, order, n_phonons)
+        #a sample of exactly 0.0 is always accepted and has no logarithm
+        #when the kernels run in the interpreter
+        if sample < upper and \
+            (sample == 0.0 or log(sample/upper) < neg_tau_omega*(t_rem - t_gen)):
+            if n_phonons == gen_times.shape[0]:
+                gen_times = grow_times(gen_times)
+                rem_times = grow_times(rem_times)
+            gen_times[n_phonons] = t_gen
+            rem_times[n_phonons] = t_rem
+            n_phonons += 1
+            order += 2
+            interaction_time_sum += t_rem - t_gen
+    else:
+        index = min(int(u0*n_phonons), n_phonons - 1)
+        t_gen = gen_times[index]
+        t_rem = rem_times[index]
+        #the inverse propagator is >= 1 so the ratio is bounded from below
+        lower = inv_scaling*proposal_remove_ratio(t_gen, order, n_phonons)
+        if sample < lower or \
+            log(sample/lower) < pos_tau_omega*(t_rem - t_gen):
+            n_phonons -= 1
+            gen_times[index] = gen_times[n_phonons]
+            rem_times[index] = rem_times[n_phonons]
+            order -= 2
+            interaction_time_sum = interaction_time_sum - (t_rem - t_gen) \
+                                   if n_phonons else 0.0
+
+    return gen_times, rem_times, n_phonons, order, interaction_time_sum
+
+@njit(cache=True)
+def run_burnin(rng, coins, gen_times, rem_times, n_phonons, order,
+               interaction_time_sum, omega, g, time):
+    """This function runs one MonteCarlo step of the Markov chain for each
+    of the coin flips to thermalize the chain, without measuring the
+    sampled diagrams
+
+    Parameters:
+        rng : np.random.Generator used to sample the updates
+        coins : array of 0 (add phonon) and 1 (remove phonon) flips
+        gen_times, rem_times : arrays with the generation and removal times
+            of the phonons of the diagram
+        n_phonons, order, interaction_time_sum : current state of the diagram
+        omega, g, time : parameters of the polaron
+
+    Return:
+        tuple with the (possibly grown) arrays of generation and removal
+        times, the number of phonons, the order and the sum of the
+        interaction times of the final diagram
+    ------------------------
+    Notes:
+    The constant factors of the weight ratios are evaluated once
+    before the loop.
+    The three uniform random numbers used by each step are drawn in batches
+    of _RANDOM_BATCH steps.
+    The incremental sum of the interaction times is summed again every
+    _RESUM_PERIOD steps to avoid the accumulation of rounding errors.
+    """
+    pos_tau_omega = time*omega
+    neg_tau_omega = -pos_tau_omega
+    scaling = (g*time)**2
+    inv_scaling = 1.0/scaling
+    nsteps = coins.shape[0]
+    uniforms = rng.random((min(_RANDOM_BATCH, nsteps), 3))
+    row = 0
+    for step in range(nsteps):
+        if row == uniforms.shape[0]:
+            uniforms = rng.random((min(_RANDOM_BATCH, nsteps - step), 3))
+            row = 0
+        gen_times, rem_times, n_phonons, order, interaction_time_sum = mc_step(
+            coins[step], uniforms[row, 0], uniforms[row, 1], uniforms[row, 2],
+            gen_times, rem_times, n_phonons, order, interaction_time_sum,
+            pos_tau_omega, neg_tau_omega, scaling, inv_scaling)
+        row += 1
+        if (step + 1) % _RESUM_PERIOD == 0:
+            interaction_time_sum = interaction_time(gen_times, rem_times, n_phonons)
+
+    return gen_times, rem_times, n_phonons, order, interaction_time_sum
+
+@njit(cache=True)
+def run_production(rng, coins, gen_times, rem_times, n_phonons, order,
+                   interaction_time_sum, omega, g, time,
+                   order_sequence, energy_sequence, start, thin):
+    """This function runs one MonteCarlo step of the Markov chain for each
+    of the coin flips and stores the order and energy of the sampled diagrams
+
+    Parameters:
+        rng : np.random.Generator used to sample the updates
+        coins : array of 0 (add phonon) and 1 (remove phonon) flips
+        gen_times, rem_times : arrays with the generation and removal times
+            of the phonons of the diagram
+        n_phonons, order, interaction_time_sum : current state of the diagram
+        omega, g, time : parameters of the polaron
+        order_sequence, energy_sequence : arrays that store the sampled diagrams
+        start : index of the first entry of the sequences to fill
+        thin : the diagram is stored once every thin steps
+
+    Return:
+        tuple with the (possibly grown) arrays of generation and removal
+        times, the number of phonons, the order and the sum of the
+        interaction times of the final diagram
+    ------------------------
+    Notes:
+    The sequences are filled with len(coins)//thin diagrams, the ones at
+    the end of each group of thin steps; a thin greater than 1 reduces the
+    autocorrelation between consecutive stored diagrams.
+    The energy is evaluated only for the stored diagrams from the
+    incremental sum of the interaction times, see run_burnin for the
+    other notes.
+    """
+    pos_tau_omega = time*omega
+    neg_tau_omega = -pos_tau_omega
+    scaling = (g*time)**2
+    inv_scaling = 1.0/scaling
+    nsteps = coins.shape[0]
+    uniforms = rng.random((min(_RANDOM_BATCH, nsteps), 3))
+    row = 0
+    sample = start
+    for step in range(nsteps):
+        if row == uniforms.shape[0]:
+            uniforms = rng.random((min(_RANDOM_BATCH, nsteps - step), 3))
+            row = 0
+        gen_times, rem_times, n_phonons, order, interaction_time_sum = mc_step(
+            coins[step], uniforms[row, 0], uniforms[row, 1], uniforms[row, 2],
+            gen_times, rem_times, n_phonons, order, interaction_time_sum,
+            pos_tau_omega, neg_tau_omega, scaling, inv_scaling)
+        row += 1
+        if (step + 1) % _RESUM_PERIOD == 0:
+            interaction_time_sum = interaction_time(gen_times, rem_times, n_phonons)
+
+        if (step + 1) % thin == 0:
+            order_sequence[sample] = order
+            energy_sequence[sample] = estimator_energy(interaction_time_sum,
+                                                       order, omega, time)
+            sample += 1
+
+    return gen_times, rem_times, n_phonons, order, interaction_time_sum
+
+@njit(cache=True, parallel=True)
+def run_chains(seeds, nsteps_burn, nsteps, omega, g, time):
+    """This function runs independent Markov chains of the same polaron
+    in parallel, one for each seed
+
+    Parameters:
+        seeds : array with the seed of the random numbers of each chain
+        nsteps_burn : number of steps to thermalize each chain
+        nsteps : number of sampled diagrams of each chain
+        omega, g, time : parameters of the polaron
+
+    Return:
+        tuple of arrays of shape (nchains, nsteps) with the order and
+        energy of the diagrams sampled by each chain
+    ------------------------
+    Notes:
+    Each chain starts from an empty diagram and runs entirely in one
+    iteration of the parallel loop, so its state is private to a thread
+    and it writes only its own rows of the sequences.
+    The random numbers are drawn from the random state of the thread,
+    seeded at the start of the chain with its own seed so the results
+    do not depend on the scheduling of the chains.
+    """
+    pos_tau_omega = time*omega
+    neg_tau_omega = -pos_tau_omega
+    scaling = (g*time)**2
+    inv_scaling = 1.0/scaling
+    nchains = seeds.shape[0]
+    order_sequence = np.empty((nchains, nsteps), dtype=np.int32)
+    energy_sequence = np.empty((nchains, nsteps), dtype=np.float64)
+
+    for k in prange(nchains):
+        np.random.seed(seeds[k])
+        gen_times = np.empty(INITIAL_CAPACITY)
+        rem_times = np.empty(INITIAL_CAPACITY)
+        n_phonons = 0
+        order = 0
+        interaction_time_sum = 0.0
+        for step in range(nsteps_burn + nsteps):
+            coin = 1 if np.random.random() < 0.5 else 0
+            gen_times, rem_times, n_phonons, order, interaction_time_sum = mc_step(
+                coin, np.random.random(), np.random.random(), np.random.random(),
+                gen_times, rem_times, n_phonons, order, interaction_time_sum,
+                pos_tau_omega, neg_tau_omega, scaling, inv_scaling)
+            if (step + 1) % _RESUM_PERIOD == 0:
+                interaction_time_sum = interaction_time(gen_times, rem_times, n_phonons)
+            if step >= nsteps_burn:
+                order_sequence[k, step - nsteps_burn] = order
+                energy_sequence[k, step - nsteps_burn] = estimator_energy(
+                    interaction_time_sum, order, omega, time)
+
+    return order_sequence, energy_sequence
+
+def compile_kernels():
+    """This function calls each kernel once on trivial inputs, so that all
+    of them are compiled and stored in the on-disk cache
+
+    Notes:
+    The following simulations, or test sessions, load the compiled
+    kernels from the cache without paying the compilation time
+    """
+    rng = np.random.default_rng()
+    run_burnin(rng, np.zeros(1, dtype=np.uint8), np.empty(INITIAL_CAPACITY),
+               np.empty(INITIAL_CAPACITY), 0, 0, 0.0, 1.0, 1.0, 1.0)
+    run_production(rng, np.zeros(1, dtype=np.uint8), np.empty(INITIAL_CAPACITY),
+                   np.empty(INITIAL_CAPACITY), 0, 0, 0.0, 1.0, 1.0, 1.0,
+                   np.empty(1, dtype=np.int32), np.empty(1), 0, 1)
+    run_production(rng, np.zeros(1, dtype=np.uint8), np.empty(INITIAL_CAPACITY),
+                   np.empty(INITIAL_CAPACITY), 0, 0, 0.0, 1.0, 1.0, 1.0,
+                   np.empty(1, dtype=np.int32), np.empty(1, dtype=np.float32), 0, 1)
+    run_chains(np.zeros(1, dtype=np.uint32), 1, 1, 1.0, 1.0, 1.0)
+    #scalar kernels called by the methods of the Polaron class
+    metropolis(0.5)
+    weigth_ratio_add(0.2, 0.5, -1.0, 1.0)
+    weigth_ratio_remove(0.2, 0.5, 1.0, 1.0)
+    log_weigth_ratio_add(0.2, 0.5, -1.0, 0.0)
+    log_weigth_ratio_remove(0.2, 0.5, 1.0, 0.0)
+    proposal_add_ratio(0.2, 0, 0)
+    proposal_remove_ratio(0.2, 2, 1)
+    estimator_energy(0.3, 2, 1.0, 1.0)
+    diagram_energy(np.empty(INITIAL_CAPACITY), np.empty(INITIAL_CAPACITY), 0, 0, 1.0, 1.0)
+
+if __name__ == "__main__":
+    compile_kernels()
+    print('Kernels compiled and cached')
@@ -13,6 +13,7 @@ PLOT :
 -distribution of number of phonons presents in each diagram
 """
 
+import matplotlib
 import numpy as np
 import plot
 from dmc import run_diagrammatic_montecarlo, run_thermalization_steps
@@ -30,6 +31,11 @@ if __name__ == "__main__":
     #check parameters are positive
     config_parser.check_positive_parameters(settings)
 
+    #skip the initialization of a GUI backend when the plot is only saved,
+    #the backend is selected once before pyplot is imported by the plot
+    if not settings.INTERACTIVE:
+        matplotlib.use('Agg')
+
     #get path to store plot 
     path_plot = config.get_path_plot()
 
@@ -39,32 +45,31 @@ if __name__ == "__main__":
     #ensure storage directories exist
     config_parser.ensure_storage_directories_exist(path_plot,path_data)
 
-    polaron=Polaron(settings['OMEGA'], settings['G'], 
-                    settings['TIME'])
-    
     #setting seed for the rng or use a random one if not provided
     seed_dict = config.get_seed()
+    rng = np.random.default_rng(seed_dict['SEED'])
     if seed_dict['SEED'] == None:
-        np.random.seed()
         print("Seed not provided: the random number generator will be initialized with a random seed")
     else:
-        np.random.seed(seed_dict['SEED'])
         print(f"""Setting seed of random number generator
                with value{seed_dict['''SEED''']}""")
 
-    if settings['NSTEPS_BURN'] > 0:
+    polaron=Polaron(settings.OMEGA, settings.G,
+                    settings.TIME, rng)
+
+    if settings.NSTEPS_BURN > 0:
         print("Starting thermalization of Markov chain" + '\n'
               + "----------------------------------------")
-        polaron = run_thermalization_steps(polaron, settings['NSTEPS_BURN'])
+        polaron = run_thermalization_steps(polaron, settings.NSTEPS_BURN)
         print("Thermalization steps for Markov chain ended :")
         print(f"""Starting features in the Feynman diagram of the polaron:
-        - Diagram order : {polaron.diagram['order']}
-        - Lifetime : {polaron.diagram['time']}""" + '\n' +
+        - Diagram order : {polaron.order}
+        - Lifetime : {polaron.time}""" + '\n' +
         "----------------------------------------")
 
-    print(f'Starting MonteCarlo simulation of {settings["""NSTEPS"""]} steps' + '\n' 
+    print(f'Starting MonteCarlo simulation of {settings.NSTEPS} steps' + '\n' 
             + "----------------------------------------")
-    order_sequence, energy_sequence = run_diagrammatic_montecarlo(polaron, settings['NSTEPS'])
+    order_sequence, energy_sequence = run_diagrammatic_montecarlo(polaron, settings.NSTEPS)
     print('Simulation ended!')
     plot.plot_montecarlo(order_sequence, energy_sequence, 
                          settings, seed_dict, path_plot, path_data)
@@ -1,24 +1,5 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from os import stat, path
-from matplotlib.lines import Line2D
-from scipy.optimize import curve_fit
-from scipy.stats import poisson
-
-def get_bins_edges(sequence : np.ndarray) -> list[float]:
-    """This method set the left and right edges for each bin of
-    the histogram. The bin is centered on each of the possible integer
-    values sampled
-
-    Parameters:
-        sequence : an array that contains the sampled values
-    
-    Return:
-        left and right edges for each bin in the histogram
-    """
-    n_bins = np.max(sequence) + 1
-    bins_edges = [i-0.5 for i in range(n_bins+1)]
-    return bins_edges
+from config_parser import Settings
 
 def poisson_func(values : np.ndarray, mean : float) -> np.ndarray:
     """This function returns the probability mass function
@@ -27,11 +8,21 @@ def poisson_func(values : np.ndarray, mean : float) -> np.ndarray:
     Parameters:
         values: domain values where the poissonian is evaluated
         mean: mean value of expected events for the distribution
+
+    Notes:
+    The pmf is evaluated directly as exp(k*log(mean) - mean - log(k!))
+    where xlogy gives 0 for k = 0 also when mean = 0 and the pmf
+    is set to 0 for negative values
     """
-    return poisson.pmf(values, mean)
+    from scipy.special import gammaln, xlogy
 
-def plot_montecarlo(order_sequence : list, energy_sequence : list, 
-                    settings : dict[str, int | float | bool],
+    values = np.asarray(values, dtype=np.float64)
+    k = np.maximum(values, 0.0)
+    log_pmf = xlogy(k, mean) - mean - gammaln(k + 1)
+    return np.where(values < 0, 0.0, np.exp(log_pmf))
+
+def plot_montecarlo(order_sequence : np.ndarray, energy_sequence : np.ndarray, 
+                    settings : Settings,
                     seed : dict[str, int | None], path_plot : dict[str, str],
                     path_data : dict[str,str]):
     """
@@ -45,7 +36,7 @@ def plot_montecarlo(order_sequence : list, energy_sequence : list,
     Parameters:
         -order_sequence: sequence of orders of each of the sampled diagrams in the simulation
         -energy_sequence: sequence of energies of each of the sampled diagrams in the simulation
-        -settings : dictionary with the physical and technical parameters of the simulation
+        -settings : Settings object with the physical and technical parameters of the simulation
             (e.g. frequency of phonons, number of MonteCarlo steps...)
         -path_plot: dictionary with the destinations to store plots (e.g. phonons distribution)
         -path_data: dictionary with the destinations to store relevant parameters and
@@ -55,21 +46,26 @@ def plot_montecarlo(order_sequence : list, energy_sequence : list,
     Notes:
     -Occurrences for each bin of the histogram are normalized to the number of samples
     -Plot of the sampled probability distribution vs the analitycal one (Poisson)
+    whose mean is the maximum likelihood estimate i.e. the sample mean
+    -matplotlib is imported here so that importing this module stays cheap,
+    the backend is left to the caller (main.py selects Agg when the plot
+    is not interactive)
     """
 
-    energy_sequence=np.array(energy_sequence)
-    phonons_sequence = np.divide(order_sequence,2).astype('uint32')
+    #order = 2 * number of phonons, the shift keeps the integer dtype
+    phonons_sequence = order_sequence >> 1
 
-    mean_phonons = np.mean(phonons_sequence)
-    mean_energy = np.mean(energy_sequence)
+    mean_phonons = float(order_sequence.sum()) * 0.5 / order_sequence.size
+    #the energies are accumulated in double precision also when stored in single precision
+    mean_energy = np.mean(energy_sequence, dtype=np.float64)
 
-    #variable from settings dictionary
-    g = settings['G']
-    omega = settings['OMEGA']
-    time = settings['TIME']
-    nsteps = settings['NSTEPS']
-    nsteps_burn = settings['NSTEPS_BURN']
-    interactive = settings['INTERACTIVE']
+    #variable from settings
+    g = settings.G
+    omega = settings.OMEGA
+    time = settings.TIME
+    nsteps = settings.NSTEPS
+    nsteps_burn = settings.NSTEPS_BURN
+    interactive = settings.INTERACTIVE
 
     #seed of the random number generator for the simulation
     seed_val = seed['SEED']
@@ -84,54 +80,43 @@ def plot_montecarlo(order_sequence : list, energy_sequence : list,
     energy_label = r'$E_{GS} =$ ' + f'{mean_energy:.3f}'
     phonons_label = 'DiagMC: ' + r'$\overline{N_{pho}}/\omega\tau$ = ' + f'{mean_phonons/(time*omega):.4f}'
 
-    occ, bins, _ = plt.hist(phonons_sequence, density=True, bins=get_bins_edges(phonons_sequence),
-        ec='black', fc='blue', alpha=0.8)
+    import matplotlib.pyplot as plt
+    from matplotlib.lines import Line2D
+
+    fig, ax = plt.subplots()
+
+    #histogram of the phonons with unit bins centered on each integer value
+    counts = np.bincount(phonons_sequence)
+    ax.bar(np.arange(len(counts)), counts / counts.sum(), width=1.0,
+            ec='black', fc='blue', alpha=0.8)
     
-    bins_center = np.array([(a+b)/2 for a,b in zip(bins[:-1], bins[1:])])
-    par, _ = curve_fit(poisson_func, bins_center, occ, maxfev=5000)
+    #the maximum likelihood estimate of the poisson mean is the sample mean
     x_phonons = np.arange(phonons_sequence.min()-5,phonons_sequence.max()+5)
-    plt.plot(x_phonons, poisson_func(x_phonons, *par), color='red', ls='-')
-    plt.xlabel(r'$N_{phonons}$')
-    plt.ylabel(r'P($N_{phonons}$)')
+    ax.plot(x_phonons, poisson_func(x_phonons, mean_phonons), color='red', ls='-')
+    ax.set_xlabel(r'$N_{phonons}$')
+    ax.set_ylabel(r'P($N_{phonons}$)')
     
     legend_elements = [Line2D([0], [0], color='b', label=phonons_label),
                         Line2D([0], [0], color='r', label=r'Poisson fit: ' + r'$\overline{N_{pho}}/\omega\tau = $ ' + 
-                               '%5.4f' % tuple(par/(omega*time))),
+                               '%5.4f' % (mean_phonons/(omega*time))),
                         Line2D([0], [0], color='y', label=r'Theory: ' + r'$N_{pho} = $ ' + 
                                r'$\frac{g^{2}}{\omega^{2}}$ = ' + f'{g**2/omega**2:.4f}'),
                         Line2D([0], [0], color='g', label=energy_label)]
-    plt.legend(handles=legend_elements)
+    ax.legend(handles=legend_elements)
     
-    plt.suptitle(fr'''g = {g} $\omega$ = {omega} nsteps_burn = {nsteps_burn} nsteps = {nsteps} $\tau$ = {time}''')
-    plt.savefig(plot_phonons, bbox_inches='tight')
+    fig.suptitle(fr'''g = {g} $\omega$ = {omega} nsteps_burn = {nsteps_burn} nsteps = {nsteps} $\tau$ = {time}''')
+    fig.savefig(plot_phonons, bbox_inches='tight')
     if interactive :
         plt.show()
+    plt.close(fig)
 
-    if not path.isfile(data_energy_phonons):
-        with open(data_energy_phonons, 'a') as file:
-            pass
-
-    #if file empty write column labels and values
-    if stat(data_energy_phonons).st_size == 0 or not append_data:      
-        with open(data_energy_phonons, 'w') as file:
+    #append the values or overwrite the file depending on APPEND,
+    #the column labels are written only if the file is empty
+    with open(data_energy_phonons, 'a' if append_data else 'w') as file:
+        if file.tell() == 0:
             #column labels for output 
-            print('g' + ' ' + 'omega' + ' ' + 'time' + ' ' + 
-                  'nsteps_burn' + ' ' + 'nsteps' + ' ' + 'seed' + ' ' +
-                  'mean_phonons_DMC' + ' ' + 'mean_energy_DMC', 
-                  file=file)
-            #actual values
-            print(str(g) + ' ' + str(omega) + ' ' + 
-                  str(time) + ' ' + str(nsteps_burn) + ' ' + 
-                  str(nsteps) + ' ' + str(seed_val) + ' ' + f'{mean_phonons:.5f}'
-                  + ' ' + f'{mean_energy:.5f}', file=file)
-    else:
-        #print actual values
-        with open(data_energy_phonons, 'a') as file:
-            #actual values
-            print(str(g) + ' ' + str(omega) + ' ' + 
-                  str(time) + ' ' + str(nsteps_burn) + ' ' + 
-                  str(nsteps) + ' ' + str(seed_val) + ' ' + f'{mean_phonons:.5f}' 
-                  + ' ' + f'{mean_energy:.5f}', file=file)
-
-
-
+            file.write('g omega time nsteps_burn nsteps seed '
+                       'mean_phonons_DMC mean_energy_DMC\n')
+        #actual values
+        file.write(f'{g} {omega} {time} {nsteps_burn} {nsteps} {seed_val} '
+                   f'{mean_phonons:.5f} {mean_energy:.5f}\n')
@@ -1,4 +1,6 @@
+from math import log
 import numpy as np
+import kernels
 
 class Polaron:
     """This class contains the properties of an Holstein polaron and the
@@ -6,22 +8,46 @@ class Polaron:
 
     Attributes
     ----------
+    g :
+        Intensity of electron-phonon coupling
+
+    omega :
+        Frequency of the phonons that couple to the extra electron
+
+    time :
+        Lifetime of the polaron
+
+    order :
+        Order of the current Feynman diagram sampled
+
+    total_energy :
+        Energy of the diagram evaluated through an estimator
+
     diagram :
-        stores the general properties of a Feynman diagram
-        produced during the simulation:
-        - g : Intensity of electron-phonon coupling
-        - omega : Frequency of the phonons that couple to the extra electron
-        - time : Lifetime of the polaron
-        - energy : Energy of the diagram evaluated through an estimator
-        - order : Order of the current Feynman diagram sampled
+        read-only dictionary with the general properties of the current
+        Feynman diagram (g, omega, time, order, total_energy)
+
+    gen_times, rem_times :
+        preallocated arrays whose first n_phonons entries store the
+        generation and removal time of the phonons that couples to the
+        electron. These are scaled imaginary time values.
 
     phonon_list :
-        stores the generation and removal time of the phonons that
-        couples to the electron. These are scaled imaginary time values.
+        array of shape (n_phonons, 2) with the generation and removal
+        time of each phonon
+
+    n_phonons :
+        number of phonons in the current diagram
     
+    order_sequence :
+        preallocated array with the order of each of the sampled diagrams
+
     energy_sequence :
-        energy values evaluated through an estimator for each of the
-        sampled diagrams
+        preallocated array with the energy values evaluated through an
+        estimator for each of the sampled diagrams
+
+    rng :
+        random number generator used to sample the updates
 
     Methods
     -------
@@ -32,16 +58,16 @@ class Polaron:
         factor to add when considering the ratio between the values of
         two Feynman diagrams due to the use of imaginary scaled times.
 
-    weigth_ratio_add(phonon):
+    weigth_ratio_add(t_gen, t_rem):
         ratio between the proposed Feynman diagram with an extra phonon
         and the current one
 
-    proposal_add_ratio(phonon):
+    proposal_add_ratio(t_gen):
         ratio between the proposal probability for the inverse process
         where the current state is proposed from a state with an extra phonon
         and the proposal probality for a state with an extra phonon
 
-    add_internal():
+    add_internal(t_gen, t_rem):
         add a phonon to the phonon_list and updates the order of the
         diagram
 
@@ -53,11 +79,11 @@ class Polaron:
     choose_phonon() :
         retrieve randomly a phonon from the ones stored in the diagram
 
-    weigth_ratio_remove(phonon) :
+    weigth_ratio_remove(t_gen, t_rem) :
         ratio between the value of the proposed Feynman diagram without
         one the phonons present in the current diagram and the current one
 
-    proposal_remove_ratio(phonon) :
+    proposal_remove_ratio(t_gen) :
         ratio between the proposal probality for the current state from the
         proposed state with one phonon removed and the proposal probality
         for a state with one less phonon
@@ -75,44 +101,113 @@ class Polaron:
         evaluate the energy contribution to the polaron energy from
         the current Feynman diagram
 
-    set_starting_info():
-        initialize the lists for the order, energy and lifetime
-        sequences after the thermalization of the Markov chain
+    set_starting_info(nsteps, out_path, energy_dtype):
+        allocate the arrays for the order and energy sequences
+        after the thermalization of the Markov chain, eventually
+        mapping them to files
+
+    update_diagrams_info():
+        store the order and energy of the current diagram in the
+        next entry of the order and energy sequences
+
+    run_burnin(coins):
+        run one MonteCarlo step for each coin flip with the compiled
+        kernel without storing the sampled diagrams
+
+    run_production(coins, thin):
+        run one MonteCarlo step for each coin flip with the compiled
+        kernel storing one sampled diagram every thin steps
+
+    reset():
+        bring the polaron back to an empty diagram of order zero
+        with empty order and energy sequences
+
+    run(nsteps, measure):
+        run nsteps MonteCarlo steps in the interpreter, eventually
+        storing the sampled diagrams, without the compiled kernels
 
     """
 
-    def __init__(self, omega : float, g : float, time : float):
+    __slots__ = ('omega', 'g', 'time', 'order', 'total_energy',
+                 '_pos_tau_omega', '_neg_tau_omega', '_scaling', '_inv_scaling',
+                 '_log_scaling', 'gen_times', 'rem_times', 'n_phonons', '_interaction_time_sum',
+                 'order_sequence', 'energy_sequence', '_step', 'rng')
+
+    def __init__(self, omega : float, g : float, time : float,
+                 rng : np.random.Generator | None = None):
         """This function builds:
-            - diagram : a dictionary that stores the features of the Feynman's diagram of a polaron.
-                It stores both fixed parameters and variables read from a configuration file.
+            - the features of the Feynman's diagram of a polaron stored as attributes.
+                They are both fixed parameters read from a configuration file (omega, g, time)
+                and variables of the current diagram (order, total_energy).
 
-            - phonon_list : empty list that is updated at each step to store the phonons 
-                coupled to the electron at the current MonteCarlo step
+            - gen_times, rem_times : preallocated arrays that are updated at each step to
+                store the generation and removal times of the phonons coupled to the
+                electron at the current MonteCarlo step in their first n_phonons entries.
+                Their capacity is doubled when they are full
 
-            - order_sequence : empty list that will store the order of each diagram sampled during the
+            - order_sequence : empty array that will store the order of each diagram sampled during the
                 MonteCarlo simulation. It will we used to reproduce the sampled distribution for the number 
                 of phonons (n_phonons = order/2)
             
-            - energy_sequence : empty list that will store the energy of each diagram sampled during the
+            - energy_sequence : empty array that will store the energy of each diagram sampled during the
                 MonteCarlo simulation. It will we used find the ground state energy of the polaron
                 using the energy estimator
 
+            The arrays are allocated with the number of sampled diagrams by set_starting_info
+
+            - rng : random number generator shared by all the updates of the simulation
+
         Parameters:
             omega : frequency of the phonons
             g : intensity of electron-phonon coupling
             time : lifetime of the electron
+            rng : random number generator, a new one with a random seed
+                is created if not provided
         """
-        self.diagram = {}
-        self.diagram['omega'] = omega
-        self.diagram['g'] = g
-        self.diagram['time'] = time
-        self.diagram['order'] = 0
-        self.diagram['total_energy'] = 0.0
+        self.omega = omega
+        self.g = g
+        self.time = time
+        self.order = 0
+        self.total_energy = 0.0
+
+        #constant factors of the weight ratios
+        self._pos_tau_omega = time*omega
+        self._neg_tau_omega = -self._pos_tau_omega
+        self._scaling = (g*time)**2
+        self._inv_scaling = 1.0/self._scaling
+        self._log_scaling = log(self._scaling)
       
-        self.phonon_list = []
-        self.order_sequence = []
-        self.energy_sequence = []
- 
+        self.gen_times = np.empty(kernels.INITIAL_CAPACITY, dtype=np.float64)
+        self.rem_times = np.empty(kernels.INITIAL_CAPACITY, dtype=np.float64)
+        self.n_phonons = 0
+        self._interaction_time_sum = 0.0
+        self.order_sequence = np.empty(0, dtype=np.int32)
+        self.energy_sequence = np.empty(0, dtype=np.float64)
+        self._step = 0
+
+        self.rng = np.random.default_rng() if rng is None else rng
+
+    @property
+    def diagram(self) -> dict[str, int | float]:
+        """This property returns a snapshot of the features of the current
+        Feynman diagram
+
+        Return:
+            dictionary with omega, g, time, order and total_energy
+        """
+        return {'omega' : self.omega, 'g' : self.g, 'time' : self.time,
+                'order' : self.order, 'total_energy' : self.total_energy}
+
+    @property
+    def phonon_list(self) -> np.ndarray:
+        """This property returns the phonons of the current diagram
+
+        Return:
+            array of shape (n_phonons, 2) with the generation and removal
+            time of each phonon
+        """
+        return np.column_stack((self.gen_times[:self.n_phonons],
+                                self.rem_times[:self.n_phonons]))
 
     def metropolis(self, prob : float) -> int | float:
         """This function uses the Metropolis choice for the 
@@ -124,9 +219,13 @@ class Polaron:
                 
         Returns:
             minimum between one and the ratio of acceptance probabilities for
-            an update and its reverse"""
+            an update and its reverse
+
+        Notes:
+        The updates inline the same choice comparing the ratio directly
+        with the sampled acceptance, so this method is not called at each step"""
         
-        return min(1, prob)
+        return kernels.metropolis(prob)
 
     def add_phonon_scaling(self) -> float :
         """This method evaluate the scaling factor for the value
@@ -137,12 +236,13 @@ class Polaron:
         ---------------------
         Notes:
             this factor comes from the use of imaginary scaled times
+            and it is evaluated once when the polaron is built
         """
         
-        return (self.diagram['g']*self.diagram['time'])**2
+        return self._scaling
 
 
-    def weigth_ratio_add(self, phonon : np.ndarray) -> float :
+    def weigth_ratio_add(self, t_gen : float, t_rem : float) -> float :
         """This method evaluate the ratio between the proposed diagram with an additional
         phonon and the current one.
 
@@ -150,18 +250,17 @@ class Polaron:
         in a diagram
         
         Parameters:
-            phonon : array that contains the initial and final time for the interaction
+            t_gen, t_rem : initial and final time for the interaction
                 line of the proposed phonon
             
         Return:
             scaling factor due to imaginary scaled times multiplied by the contribution of 
             a phonon propagator (phonon interaction line)"""
         
-        phonon_propagator = np.exp(-self.diagram['time']*self.diagram['omega'] *
-                            (phonon[1] - phonon[0]))
-        return self.add_phonon_scaling()*phonon_propagator
+        return kernels.weigth_ratio_add(t_gen, t_rem, self._neg_tau_omega,
+                                        self._scaling)
 
-    def proposal_add_ratio(self, phonon : np.ndarray) -> float :
+    def proposal_add_ratio(self, t_gen : float) -> float :
         """This method evaluate the ratio between the proposal probability of choosing the reverse
         update (i.e. removing the phonon added) and the current one (i.e. adding the phonon)
 
@@ -169,8 +268,7 @@ class Polaron:
         - direct update: probability to generate the picked phonon with those specific times i.e. 1*(1-t_gen)
 
         Parameters:
-            phonon: array that contains the initial and final time for the interaction
-                line of the proposed phonon
+            t_gen: initial time for the interaction line of the proposed phonon
 
         Return:
             ratio between proposal probability for the reverse update and the direct one 
@@ -190,24 +288,25 @@ class Polaron:
          pick up the choosen phonon among the one coupled to the electron in the current diagram +
          the proposed one
         """
-        if self.diagram['order'] == 0 :
-            # direct update at order 0 can be only add_phonon 
-            return 1/2*(1-phonon[0])/(len(self.phonon_list)+1)
-        elif self.diagram['order'] != 0 :
-            # order != 0 direct can be either add or remove phonon
-            return (1-phonon[0])/(len(self.phonon_list)+1)
+        return kernels.proposal_add_ratio(t_gen, self.order, self.n_phonons)
         
-    def add_internal(self, phonon : np.ndarray):
-        """This method append a phonon to the list of phonons already coupled
+    def add_internal(self, t_gen : float, t_rem : float):
+        """This method append a phonon to the array of phonons already coupled
         to the electron and update the order of the diagram
         
         Parameters:
-            phonon: array that contains the initial and final time for the interaction
+            t_gen, t_rem: initial and final time for the interaction
                 line of the proposed phonon
         """
 
-        self.phonon_list.append(phonon)
-        self.diagram['order'] += 2
+        if self.n_phonons == self.gen_times.shape[0]:
+            self.gen_times = kernels.grow_times(self.gen_times)
+            self.rem_times = kernels.grow_times(self.rem_times)
+        self.gen_times[self.n_phonons] = t_gen
+        self.rem_times[self.n_phonons] = t_rem
+        self.n_phonons += 1
+        self.order += 2
+        self._interaction_time_sum += t_rem - t_gen
 
     def eval_add_internal(self):
         """This method generates a phonon and evaluates the ratio
@@ -219,27 +318,31 @@ class Polaron:
         If the update is accepted both the state of phonon_list and the
         order of the diagram change.
         One more phonon is appended and the order of the diagram increases.
+        The logarithm of the Metropolis threshold is sampled first, so the
+        proposal ratio is evaluated only if the weight ratio alone does not
+        already reject the update
         """
 
-        # generate two random time for the extrema of the phonon interaction line
-        t_gen = np.random.uniform(0, 1)
-        t_rem = np.random.uniform(t_gen, 1)
-        phonon = np.array([t_gen,t_rem])
+        # generate two random time for the extrema of the phonon interaction line,
+        # the removal time is uniform between the generation time and 1
+        t_gen = self.rng.random()
+        t_rem = t_gen + (1.0 - t_gen)*self.rng.random()
 
-        #evaluate the ratio between the acceptance probabilities of the current update and the reverse one
-        ratio_acceptance_probs = self.weigth_ratio_add(phonon) * \
-                self.proposal_add_ratio(phonon)
-        acceptance = self.metropolis(ratio_acceptance_probs)
+        #Metropolis choice: the update is accepted if the logarithm of the ratio
+        #between the acceptance probabilities of the current update and the reverse
+        #one is greater than minus an exponential random number, i.e. the logarithm
+        #of a uniform one, so a ratio of at least 1 is always accepted
+        log_threshold = -self.rng.standard_exponential()
 
-        #add phonon if metropolis returns 1
-        if acceptance == 1:
-            self.add_internal(phonon)
-        
-        #pick a random number between 0 and 1 and accept the update if the acceptance probability is greater
-        elif 0 <= acceptance < 1:
-            sample = np.random.uniform(0,1)
-            if sample <= acceptance:
-                self.add_internal(phonon)
+        #the proposal ratio is at most 1 so the weight ratio bounds the ratio from above
+        log_ratio_acceptance_probs = kernels.log_weigth_ratio_add(t_gen, t_rem, self._neg_tau_omega,
+                                                                  self._log_scaling)
+        if log_ratio_acceptance_probs <= log_threshold:
+            return
+
+        log_ratio_acceptance_probs += log(self.proposal_add_ratio(t_gen))
+        if log_threshold < log_ratio_acceptance_probs:
+            self.add_internal(t_gen, t_rem)
 
     def choose_phonon(self) -> int :
         """This method selects randomly the index of a phonon among
@@ -250,10 +353,10 @@ class Polaron:
                 the ones in the list
         """
         
-        phonon_index = np.random.randint(len(self.phonon_list))
+        phonon_index = self.rng.integers(self.n_phonons)
         return phonon_index
 
-    def weigth_ratio_remove(self, phonon : np.ndarray) -> float:
+    def weigth_ratio_remove(self, t_gen : float, t_rem : float) -> float:
         """This method evaluate the ratio between the proposed diagram with one less phonon
         phonon and the current one 
 
@@ -261,18 +364,17 @@ class Polaron:
         phonon interaction line in a diagram
         
         Parameters:
-            phonon : array that contains the initial and final time for the interaction
+            t_gen, t_rem : initial and final time for the interaction
                 line of the selected phonon
             
         Return:
             Contribution from the reciprocal of a phonon propagator (phonon interaction line)
             divided by the scaling factor due to imaginary scaled times"""
         
-        phonon_propagator_inverse = np.exp(self.diagram['time']*self.diagram['omega']*
-                                (phonon[1] - phonon[0]))
-        return phonon_propagator_inverse/self.add_phonon_scaling()
+        return kernels.weigth_ratio_remove(t_gen, t_rem, self._pos_tau_omega,
+                                           self._inv_scaling)
 
-    def proposal_remove_ratio(self, phonon : np.ndarray) -> float :
+    def proposal_remove_ratio(self, t_gen : float) -> float :
         """This method evaluate the ratio between the proposal probability of choosing the reverse
         update (i.e. adding the phonon) and the current one (i.e. removing the chosen phonon)
 
@@ -280,8 +382,7 @@ class Polaron:
         - direct update: probability to pick up a specific phonon among many i.e. 1/(# of phonons)
 
         Parameters:
-            phonon: array that contains the initial and final time for the interaction
-                line of the proposed phonon
+            t_gen: initial time for the interaction line of the chosen phonon
 
         Return:
             ratio between proposal probability for the reverse update and the direct one 
@@ -298,13 +399,10 @@ class Polaron:
          the remove phonon update is 1/2. So the prefactor in this case is 2
         """
 
-        if self.diagram['order'] == 2 :
-            return 2*len(self.phonon_list)/(1-phonon[0])
-        elif self.diagram['order'] != 2 :
-            return len(self.phonon_list)/(1-phonon[0])
+        return kernels.proposal_remove_ratio(t_gen, self.order, self.n_phonons)
 
     def remove_internal(self, phonon_index : int):
-        """This method remove a phonon from the list of phonons
+        """This method remove a phonon from the array of phonons
         and update the order the diagram
         
         Parameters:
@@ -312,11 +410,18 @@ class Polaron:
                         to the chosen phonon
         Notes:
         This method changes the state of the object both decreasing 
-        the order of the diagram and 
+        the order of the diagram and removing the phonon.
+        The removed phonon is replaced by the last one of the array, so the
+        removal does not depend on the number of phonons.
         """
 
-        del self.phonon_list[phonon_index]
-        self.diagram['order'] -= 2
+        removed_interaction_time = self.rem_times[phonon_index] - self.gen_times[phonon_index]
+        self.n_phonons -= 1
+        self.gen_times[phonon_index] = self.gen_times[self.n_phonons]
+        self.rem_times[phonon_index] = self.rem_times[self.n_phonons]
+        self.order -= 2
+        self._interaction_time_sum = self._interaction_time_sum - removed_interaction_time \
+                                     if self.n_phonons else 0.0
 
     def eval_remove_internal(self):
         """This method evaluates the ratio between acceptance probabilities 
@@ -328,41 +433,217 @@ class Polaron:
         order of the diagram change.
         One phonon is removed from the list and the order of the diagram
         decreases.
+        The logarithm of the Metropolis threshold is sampled first, so the
+        proposal ratio is evaluated only if the weight ratio alone does not
+        already accept the update
         """
 
         #get a phonon randomly from the one coupled to the electron in the current diagram
         phonon_index = self.choose_phonon()
-        phonon = self.phonon_list[phonon_index]
-
-        #evaluate the ratio between the acceptance probabilities of the current update and the reverse one
-        ratio_acceptance_probs = self.weigth_ratio_remove(phonon) * \
-        self.proposal_remove_ratio(phonon)
-        acceptance = self.metropolis(ratio_acceptance_probs)
-
-        #remove phonon if metropolis returns 1
-        if acceptance == 1:
+        t_gen = self.gen_times[phonon_index]
+        t_rem = self.rem_times[phonon_index]
+
+        #Metropolis choice: the update is accepted if the logarithm of the ratio
+        #between the acceptance probabilities of the current update and the reverse
+        #one is greater than minus an exponential random number, i.e. the logarithm
+        #of a uniform one, so a ratio of at least 1 is always accepted
+        log_threshold = -self.rng.standard_exponential()
+
+        #the proposal ratio is at least 1 so the weight ratio bounds the ratio from below
+        log_ratio_acceptance_probs = kernels.log_weigth_ratio_remove(t_gen, t_rem, self._pos_tau_omega,
+                                                                     self._log_scaling)
+        if log_threshold < log_ratio_acceptance_probs or \
+            log_threshold < log_ratio_acceptance_probs + log(self.proposal_remove_ratio(t_gen)):
             self.remove_internal(phonon_index)
-        
-        #pick a random number between 0 and 1 and accept the update if the acceptance probability is greater
-        elif 0 <= acceptance < 1 :
-            sample = np.random.uniform(0,1)
-            if sample <= acceptance:
-                self.remove_internal(phonon_index)
 
     def eval_diagram_energy(self):
         """This method evaluates the energy of the system at a MonteCarlo step
         using the formula of the estimator and updates the energy of the diagram
+
+        Notes:
+        The sum of the interaction times of the phonons is kept up to date
+        by add_internal and remove_internal, so no sum over the phonons
+        is needed at each step
+        """
+        self.total_energy = kernels.estimator_energy(self._interaction_time_sum,
+                                                     self.order, self.omega, self.time)
+
+    def set_starting_info(self, nsteps : int, out_path : str | None = None,
+                          energy_dtype : type = np.float64):
+        """This method allocates the arrays that store the order and
+        energy of the diagrams sampled in the simulation
+
+        Parameters:
+            nsteps : number of diagrams that will be sampled
+            out_path : if provided the arrays are memory-mapped to the files
+                out_path.order and out_path.energy instead of being kept
+                in memory
+            energy_dtype : floating point type of the energies, np.float32
+                halves the memory of the energy sequence
+
+        Notes:
+        The memory-mapped arrays are written to disk by the operating system
+        while they are filled, so a long simulation does not need to keep the
+        whole sequences in memory.
+        The energies are always evaluated in double precision and only
+        rounded when they are stored
         """
-        if self.diagram['order'] == 0:
-            self.diagram['total_energy'] = 0.0
+        if out_path is None:
+            self.order_sequence = np.empty(nsteps, dtype=np.int32)
+            self.energy_sequence = np.empty(nsteps, dtype=energy_dtype)
         else:
-            phonons_gen_time_sum, phonons_rem_time_sum = np.sum(self.phonon_list, axis=0)
-            phonons_interaction_time_sum = phonons_rem_time_sum - phonons_gen_time_sum
-            self.diagram['total_energy'] = self.diagram['omega'] * phonons_interaction_time_sum - self.diagram['order']/ \
-                                            self.diagram['time']
+            self.order_sequence = np.memmap(out_path + '.order', dtype=np.int32,
+                                            mode='w+', shape=(nsteps,))
+            self.energy_sequence = np.memmap(out_path + '.energy', dtype=energy_dtype,
+                                             mode='w+', shape=(nsteps,))
+        self._step = 0
 
     def update_diagrams_info(self):
-        """This method update the lists of diagrams order and
-        energy of the polaron"""
-        self.order_sequence.append(self.diagram['order'])
-        self.energy_sequence.append(self.diagram['total_energy'])
+        """This method stores the order and energy of the current diagram
+        in the next entry of the arrays of diagrams order and energy
+
+        Notes:
+        The arrays have to be allocated by set_starting_info with
+        the number of diagrams that will be sampled
+        """
+        self.order_sequence[self._step] = self.order
+        self.energy_sequence[self._step] = self.total_energy
+        self._step += 1
+
+    def reset(self):
+        """This method brings the polaron back to an empty diagram of
+        order zero and empties the order and energy sequences
+
+        Notes:
+        The parameters, the arrays of phonon times with their capacity and
+        the random number generator are kept, so the object can be reused
+        without building it again
+        """
+        self.order = 0
+        self.total_energy = 0.0
+        self.n_phonons = 0
+        self._interaction_time_sum = 0.0
+        self.order_sequence = np.empty(0, dtype=np.int32)
+        self.energy_sequence = np.empty(0, dtype=np.float64)
+        self._step = 0
+
+    def run_burnin(self, coins : np.ndarray):
+        """This method runs one MonteCarlo step for each of the coin flips
+        with the compiled kernel and updates the state of the diagram
+        without storing the sampled diagrams
+
+        Parameters:
+            coins : array of 0 (add phonon) and 1 (remove phonon) flips
+
+        Notes:
+        The random numbers of the updates are drawn inside the kernel
+        from the random number generator of the polaron
+        """
+        (self.gen_times, self.rem_times, self.n_phonons, self.order,
+         self._interaction_time_sum) = \
+            kernels.run_burnin(self.rng, coins, self.gen_times, self.rem_times,
+                               self.n_phonons, self.order, self._interaction_time_sum,
+                               self.omega, self.g, self.time)
+
+    def run_production(self, coins : np.ndarray, thin : int = 1):
+        """This method runs one MonteCarlo step for each of the coin flips
+        with the compiled kernel and stores the order and energy of one
+        diagram every thin steps in the next entries of the order and
+        energy sequences
+
+        Parameters:
+            coins : array of 0 (add phonon) and 1 (remove phonon) flips
+            thin : number of steps between two stored diagrams
+
+        Notes:
+        The sequences have to be allocated by set_starting_info with
+        at least len(coins)//thin free entries
+        """
+        (self.gen_times, self.rem_times, self.n_phonons, self.order,
+         self._interaction_time_sum) = \
+            kernels.run_production(self.rng, coins, self.gen_times, self.rem_times,
+                                   self.n_phonons, self.order, self._interaction_time_sum,
+                                   self.omega, self.g, self.time, self.order_sequence,
+                                   self.energy_sequence, self._step, thin)
+        self._step += len(coins) // thin
+        self.eval_diagram_energy()
+
+    def run(self, nsteps : int, measure : bool = False):
+        """This method runs nsteps MonteCarlo steps in the interpreter and
+        updates the state of the diagram
+
+        Parameters:
+            nsteps : number of MonteCarlo steps
+            measure : if True the energy and order of the diagram after each
+                step are stored in the next entries of the order and energy
+                sequences, that have to be allocated by set_starting_info
+
+        Notes:
+        The add and remove updates are written inline and the attributes
+        used at each step are bound to local variables before the loop, so
+        the steps do not go through the attribute lookups and method calls
+        of eval_add_internal and eval_remove_internal.
+        The random numbers of all the steps are drawn with a single call and
+        the acceptance is decided as in kernels.mc_step, comparing in log-space
+        only when the bound of the propagator does not decide it
+        """
+        coins = self.rng.integers(0, 2, nsteps).tolist()
+        uniforms = self.rng.random((nsteps, 3)).tolist()
+
+        neg_tau_omega = self._neg_tau_omega
+        pos_tau_omega = self._pos_tau_omega
+        scaling = self._scaling
+        inv_scaling = self._inv_scaling
+        omega = self.omega
+        time = self.time
+        gen_times = self.gen_times
+        rem_times = self.rem_times
+        n_phonons = self.n_phonons
+        order = self.order
+        interaction_time_sum = self._interaction_time_sum
+        order_sequence = self.order_sequence
+        energy_sequence = self.energy_sequence
+        step = self._step
+
+        for coin, (u0, u1, sample) in zip(coins, uniforms):
+            if coin == 0 or order == 0:
+                t_gen = u0
+                t_rem = t_gen + (1.0 - t_gen)*u1
+                upper = scaling*(0.5 if order == 0 else 1.0)*(1.0 - t_gen)/(n_phonons + 1)
+                #a sample of exactly 0.0 is always accepted and has no logarithm
+                if sample < upper and (sample == 0.0 or
+                                       log(sample/upper) < neg_tau_omega*(t_rem - t_gen)):
+                    if n_phonons == gen_times.shape[0]:
+                        gen_times = kernels.grow_times(gen_times)
+                        rem_times = kernels.grow_times(rem_times)
+                    gen_times[n_phonons] = t_gen
+                    rem_times[n_phonons] = t_rem
+                    n_phonons += 1
+                    order += 2
+                    interaction_time_sum += t_rem - t_gen
+            else:
+                index = min(int(u0*n_phonons), n_phonons - 1)
+                t_gen = gen_times[index]
+                t_rem = rem_times[index]
+                lower = inv_scaling*(2.0 if order == 2 else 1.0)*n_phonons/(1.0 - t_gen)
+                if sample < lower or log(sample/lower) < pos_tau_omega*(t_rem - t_gen):
+                    n_phonons -= 1
+                    gen_times[index] = gen_times[n_phonons]
+                    rem_times[index] = rem_times[n_phonons]
+                    order -= 2
+                    interaction_time_sum = interaction_time_sum - (t_rem - t_gen) \
+                                           if n_phonons else 0.0
+
+            if measure:
+                order_sequence[step] = order
+                energy_sequence[step] = omega*interaction_time_sum - order/time \
+                                        if order else 0.0
+                step += 1
+
+        self.gen_times = gen_times
+        self.rem_times = rem_times
+        self.n_phonons = n_phonons
+        self.order = order
+        self._interaction_time_sum = interaction_time_sum
+        self._step = step
+        self.eval_diagram_energy()
@@ -1,7 +1,8 @@
+import pytest
 import numpy as np
 from polaron import Polaron
-from dmc import run_thermalization_steps, run_diagrammatic_montecarlo
-from test_polaron import polaron
+from dmc import (run_thermalization_steps, run_diagrammatic_montecarlo,
+                 _draw_coin_flips)
 
 def test_run_thermalization_steps(polaron):
     """This test checks that run_thermalization_steps 
@@ -13,13 +14,12 @@ def test_run_thermalization_steps(polaron):
     WHAT: apply run_thermalization_steps with a fixed number of steps
     THEN: return a valid Polaron with non negative diagram order
     """
-    np.random.seed(1)
     steps = 10 
 
     thermalized_polaron = run_thermalization_steps(polaron, steps)
 
     assert isinstance(thermalized_polaron, Polaron)
-    assert thermalized_polaron.diagram['order'] >= 0
+    assert thermalized_polaron.order >= 0
 
 def test_run_diagrammatic_montecarlo(polaron):
     """This test checks that run_diagrammatic_montecarlo 
@@ -31,7 +31,6 @@ def test_run_diagrammatic_montecarlo(polaron):
     THEN: return the lists of diagram order and energy with a length
         equals to the number of steps
     """
-    np.random.seed(1)
     steps = 10 
 
     order_sequence, energy_sequence = run_diagrammatic_montecarlo(polaron, steps)
@@ -39,6 +38,79 @@ def test_run_diagrammatic_montecarlo(polaron):
     assert len(order_sequence) == steps
     assert len(energy_sequence) == steps
 
+@pytest.mark.parametrize("thin", [0, -1])
+def test_run_diagrammatic_montecarlo_invalid_thin(polaron, thin):
+    """This test checks that run_diagrammatic_montecarlo
+    raises a ValueError when the number of steps between two
+    stored diagrams is smaller than 1
 
+    GIVEN: a polaron object
+    WHAT: apply run_diagrammatic_montecarlo with thin zero or negative
+    THEN: a ValueError is raised
+    """
+    with pytest.raises(ValueError):
+        run_diagrammatic_montecarlo(polaron, 10, thin=thin)
+
+def test_draw_coin_flips():
+    """This test checks that _draw_coin_flips returns
+    one coin flip for each step also when the number 
+    of steps is not a multiple of 8
+
+    GIVEN: a random number generator
+    WHAT: apply _draw_coin_flips with a number of steps
+    THEN: return a list of 0 and 1 with a length equal 
+        to the number of steps
+    """
+    rng = np.random.default_rng(1)
+    steps = 10
+
+    coin_flips = _draw_coin_flips(rng, steps)
+
+    assert len(coin_flips) == steps
+    assert set(coin_flips) <= {0, 1}
+
+def test_run_diagrammatic_montecarlo_memmap(polaron, tmp_path):
+    """This test checks that run_diagrammatic_montecarlo
+    writes the sequences to files when a path is provided
+
+    GIVEN: a polaron object and a path in a temporary directory
+    WHAT: apply run_diagrammatic_montecarlo with some steps
+        and the path for the sequences
+    THEN: the files contain the returned sequences of diagram
+        order and energy with a length equals to the number of steps
+    """
+    steps = 10
+    out_path = str(tmp_path / 'sequences')
+
+    order_sequence, energy_sequence = run_diagrammatic_montecarlo(polaron, steps,
+                                                                  out_path=out_path)
+
+    assert len(order_sequence) == steps
+    assert np.array_equal(np.fromfile(out_path + '.order', dtype=np.int32), order_sequence)
+    assert np.array_equal(np.fromfile(out_path + '.energy', dtype=np.float64), energy_sequence)
+
+def test_run_diagrammatic_montecarlo_single_precision(polaron):
+    """This test checks that run_diagrammatic_montecarlo
+    stores the energies in single precision when requested
+    keeping the same sampled diagrams
+
+    GIVEN: a polaron object with a seeded random number generator
+    WHAT: apply run_diagrammatic_montecarlo with the same seed storing
+        the energies in double and in single precision
+    THEN: the orders are equal and the energies in single precision
+        are the rounded energies in double precision
+    """
+    steps = 1000
+    order_sequence, energy_sequence = run_diagrammatic_montecarlo(polaron, steps)
+    order_sequence, energy_sequence = order_sequence.copy(), energy_sequence.copy()
 
+    polaron.reset()
+    polaron.rng = np.random.default_rng(1)
+    order_sequence_single, energy_sequence_single = run_diagrammatic_montecarlo(
+        polaron, steps, energy_dtype=np.float32)
 
+    assert energy_sequence_single.dtype == np.float32
+    assert np.array_equal(order_sequence_single, order_sequence)
+    assert np.allclose(energy_sequence_single, energy_sequence, rtol=1e-6, atol=1e-6)
+    assert np.isclose(np.mean(energy_sequence_single, dtype=np.float64),
+                      np.mean(energy_sequence), rtol=1e-6)
@@ -0,0 +1,124 @@
+import pytest
+import numpy as np
+from ensemble import PolaronEnsemble, run_parallel_chains
+
+@pytest.fixture
+def ensemble():
+    """This method returns a fixed ensemble of chains
+    that can be used consistently during the tests
+
+    Return:
+        ensemble of 8 chains with zero order diagrams
+    """
+    return PolaronEnsemble(8, omega=1.0, g=0.5, time=10.0,
+                           rng=np.random.default_rng(1))
+
+def test_ensemble_initialization(ensemble):
+    """This test checks that the attributes of the PolaronEnsemble
+    class are initialized correctly
+
+    GIVEN: an ensemble of chains
+    WHAT: check the attributes are initialized accordingly
+        to the given parameters
+    THEN: all the chains have an empty diagram
+    """
+    assert ensemble.nchains == 8
+    assert np.all(ensemble.order == 0)
+    assert np.all(ensemble.n_phonons == 0)
+    assert np.allclose(ensemble.total_energy, 0.0)
+    assert ensemble.order_sequence.shape == (0, 8)
+
+def test_step(ensemble):
+    """This test checks that step updates consistently the
+    diagrams of all the chains
+
+    GIVEN: an ensemble of chains
+    WHAT: apply some MonteCarlo steps
+    THEN: the orders are twice the number of phonons,
+        the stored phonons have valid times and the sums of
+        their interaction times are up to date
+    """
+    for _ in range(100):
+        ensemble.step()
+
+    assert np.array_equal(ensemble.order, 2*ensemble.n_phonons)
+    for k in range(ensemble.nchains):
+        n = ensemble.n_phonons[k]
+        gen_times = ensemble.gen_times[k, :n]
+        rem_times = ensemble.rem_times[k, :n]
+        assert np.all((0.0 <= gen_times) & (gen_times <= rem_times) & (rem_times < 1.0))
+        assert np.isclose(ensemble._interaction_time_sum[k], (rem_times - gen_times).sum(),
+                          atol=1e-12)
+
+def test_step_grows_phonons():
+    """This test checks that step doubles the capacity of the
+    arrays of phonons when a chain fills them
+
+    GIVEN: an ensemble of chains with a strong coupling
+    WHAT: apply some MonteCarlo steps
+    THEN: the arrays of phonons can store the phonons of every chain
+    """
+    ensemble = PolaronEnsemble(4, omega=1.0, g=2.0, time=10.0,
+                               rng=np.random.default_rng(1))
+    for _ in range(500):
+        ensemble.step()
+
+    assert ensemble.n_phonons.max() > 16
+    assert ensemble.gen_times.shape[1] >= ensemble.n_phonons.max()
+
+def test_run_steps(ensemble):
+    """This test checks that run_steps stores the sampled diagrams
+    of each chain
+
+    GIVEN: an ensemble of chains
+    WHAT: apply run_steps storing the sampled diagrams
+    THEN: the sequences have a row for each step and the last one
+        corresponds to the current diagrams
+    """
+    nsteps = 50
+    ensemble.set_starting_info(nsteps)
+    ensemble.run_steps(nsteps, measure=True)
+
+    assert ensemble.order_sequence.shape == (nsteps, 8)
+    assert ensemble.energy_sequence.shape == (nsteps, 8)
+    assert np.array_equal(ensemble.order_sequence[-1], ensemble.order)
+    assert np.allclose(ensemble.energy_sequence[-1], ensemble.total_energy)
+
+def test_run_parallel_chains():
+    """This test checks that run_parallel_chains returns the
+    sampled diagrams of each chain and that the chains are
+    reproducible given the random number generator
+
+    GIVEN: two random number generators with the same seed
+    WHAT: apply run_parallel_chains with each of them
+    THEN: the sequences have a row for each chain, valid orders
+        and are equal for the two runs
+    """
+    nchains, nsteps = 4, 100
+    order_sequence, energy_sequence = run_parallel_chains(
+        nchains, 1.0, 0.5, 10.0, 10, nsteps, np.random.default_rng(1))
+    order_sequence_again, energy_sequence_again = run_parallel_chains(
+        nchains, 1.0, 0.5, 10.0, 10, nsteps, np.random.default_rng(1))
+
+    assert order_sequence.shape == (nchains, nsteps)
+    assert energy_sequence.shape == (nchains, nsteps)
+    assert np.all((order_sequence >= 0) & (order_sequence % 2 == 0))
+    assert np.array_equal(order_sequence, order_sequence_again)
+    assert np.allclose(energy_sequence, energy_sequence_again)
+
+def test_run_parallel_chains_num_threads():
+    """This test checks that the chains sampled by run_parallel_chains
+    do not depend on the number of threads
+
+    GIVEN: two random number generators with the same seed
+    WHAT: apply run_parallel_chains with a single thread and with
+        all the available threads
+    THEN: the sequences are equal for the two runs
+    """
+    order_sequence, energy_sequence = run_parallel_chains(
+        4, 1.0, 0.5, 10.0, 10, 100, np.random.default_rng(1), num_threads=1)
+    order_sequence_again, energy_sequence_again = run_parallel_chains(
+        4, 1.0, 0.5, 10.0, 10, 100, np.random.default_rng(1))
+
+    assert np.array_equal(order_sequence, order_sequence_again)
+    assert np.allclose(energy_sequence, energy_sequence_again)
@@ -0,0 +1,108 @@
+import numpy as np
+from math import isclose, log
+from kernels import (diagram_energy, grow_times, interaction_time, run_burnin, run_production,
+                     weigth_ratio_add, weigth_ratio_remove,
+                     log_weigth_ratio_add, log_weigth_ratio_remove)
+
+def test_grow_times():
+    """This test checks that grow_times doubles the capacity
+    of an array of phonon times keeping the stored ones
+
+    GIVEN: an array with two generation times
+    WHAT: apply grow_times
+    THEN: get an array with twice the entries starting with the two times
+    """
+    times = np.array([0.2, 0.6])
+
+    grown = grow_times(times)
+
+    assert grown.shape == (4,)
+    assert np.allclose(grown[:2], times)
+
+def test_log_weigth_ratios():
+    """This test checks that the logarithms of the weight ratios
+    are consistent with the weight ratios
+
+    GIVEN: a phonon and the constant factors of a polaron
+    WHAT: apply log_weigth_ratio_add and log_weigth_ratio_remove
+    THEN: get the logarithms of weigth_ratio_add and weigth_ratio_remove
+    """
+    t_gen, t_rem = 0.2, 0.5
+    scaling = (0.5*10.0)**2
+
+    assert isclose(log_weigth_ratio_add(t_gen, t_rem, -10.0, log(scaling)),
+                   log(weigth_ratio_add(t_gen, t_rem, -10.0, scaling)))
+    assert isclose(log_weigth_ratio_remove(t_gen, t_rem, 10.0, log(scaling)),
+                   log(weigth_ratio_remove(t_gen, t_rem, 10.0, 1.0/scaling)))
+
+def test_run_production():
+    """This test checks that run_production fills the sequences with
+    the orders and energies of the sampled diagrams and returns
+    a consistent final diagram
+
+    GIVEN: an empty diagram with small arrays of phonon times
+    WHAT: apply run_production storing every sampled diagram
+    THEN: the orders are twice the number of phonons, the last
+        entries of the sequences are the ones of the final diagram,
+        the incremental sum of the interaction times matches the one
+        of the phonons and the arrays of phonon times have grown when needed
+    """
+    rng = np.random.default_rng(1)
+    nsteps = 1000
+    coins = np.unpackbits(np.frombuffer(rng.bytes(nsteps // 8), dtype=np.uint8))
+    order_sequence = np.empty(nsteps, dtype=np.int32)
+    energy_sequence = np.empty(nsteps, dtype=np.float64)
+
+    gen_times, rem_times, n_phonons, order, interaction_time_sum = run_production(
+        rng, coins, np.empty(1), np.empty(1), 0, 0, 0.0, 1.0, 0.5, 10.0,
+        order_sequence, energy_sequence, 0, 1)
+
+    assert order == 2*n_phonons
+    assert gen_times.shape == rem_times.shape
+    assert gen_times.shape[0] >= n_phonons
+    assert np.all(order_sequence % 2 == 0)
+    assert order_sequence[-1] == order
+    assert isclose(interaction_time_sum, interaction_time(gen_times, rem_times, n_phonons),
+                   abs_tol=1e-12)
+    assert isclose(energy_sequence[-1], diagram_energy(gen_times, rem_times, n_phonons,
+                                                       order, 1.0, 10.0), abs_tol=1e-12)
+
+def test_run_production_thin():
+    """This test checks that run_production stores one diagram
+    every thin steps
+
+    GIVEN: an empty diagram and sequences with one entry every thin steps
+    WHAT: apply run_production with thin larger than one
+    THEN: all the entries of the sequences are filled and the last
+        one corresponds to the final diagram
+    """
+    rng = np.random.default_rng(1)
+    nsteps, thin = 1000, 10
+    coins = np.unpackbits(np.frombuffer(rng.bytes(nsteps // 8), dtype=np.uint8))
+    order_sequence = np.full(nsteps // thin, -1, dtype=np.int32)
+    energy_sequence = np.empty(nsteps // thin, dtype=np.float64)
+
+    gen_times, rem_times, n_phonons, order, interaction_time_sum = run_production(
+        rng, coins, np.empty(16), np.empty(16), 0, 0, 0.0, 1.0, 0.5, 10.0,
+        order_sequence, energy_sequence, 0, thin)
+
+    assert np.all((order_sequence >= 0) & (order_sequence % 2 == 0))
+    assert order_sequence[-1] == order
+
+def test_run_burnin():
+    """This test checks that run_burnin updates the diagram
+    without storing the sampled diagrams
+
+    GIVEN: an empty diagram
+    WHAT: apply run_burnin with only add updates
+    THEN: the diagram is updated consistently
+    """
+    rng = np.random.default_rng(1)
+    coins = np.zeros(10, dtype=np.uint8)
+
+    gen_times, rem_times, n_phonons, order, interaction_time_sum = run_burnin(
+        rng, coins, np.empty(16), np.empty(16), 0, 0, 0.0, 1.0, 0.5, 10.0)
+
+    assert order == 2*n_phonons
+    assert isclose(interaction_time_sum, interaction_time(gen_times, rem_times, n_phonons),
+                   abs_tol=1e-12)
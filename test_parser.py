@@ -1,25 +1,36 @@
 import pytest
-from os import path, rmdir
+from os import path, rmdir, stat, utime
+from pathlib import Path
 from math import isclose
-from configparser import ConfigParser
+from dataclasses import FrozenInstanceError
 from config_parser import (check_positive_parameters, 
                         ensure_storage_directories_exist, 
-                        Config)
+                        Config, Settings, load_config)
 
-def test_config_initialization():
+def test_config_initialization(shared_config):
     """This test checks whether the Config class
-     is initialized correctly holding a ConfigParser object
+     is initialized correctly parsing the file once and
+     returning copies of the stored dictionaries
      
-    GIVEN: the name of the configuration file
-    WHEN: call the constructor of Config class
-    THEN: the resulting config object should be of type
-            ConfigParser
+    GIVEN: the config object parsed from the test configuration file
+    WHEN: call its get_* methods
+    THEN: the get_* methods return equal values at each call,
+            the settings cannot be modified and modifying one of the 
+            dictionaries leaves the stored values unaltered
     """
     
-    config = Config('configuration_test.txt')
-    assert isinstance(config.config, ConfigParser)
+    config = shared_config
+    settings = config.get_settings()
+    assert isinstance(settings, Settings)
+    assert settings == config.get_settings()
+    with pytest.raises(FrozenInstanceError):
+        settings.NSTEPS = 0
+
+    path_data = config.get_path_data()
+    path_data['APPEND'] = True
+    assert config.get_path_data()['APPEND'] == False
 
-def test_config_keys_values_initialization():
+def test_config_keys_values_initialization(shared_config):
     """This test checks whether the get_settings, get_seed 
     get_path_plot, get_path_data methods return dictionaries
     with the expected keys and values
@@ -29,18 +40,18 @@ def test_config_keys_values_initialization():
     THEN: the resulting dictionaries contain the expected keys and values
     """
 
-    config = Config('configuration_test.txt')
+    config = shared_config
     settings = config.get_settings()
     seed_dict = config.get_seed()
     path_plot = config.get_path_plot()
     path_data = config.get_path_data()
 
-    assert settings['NSTEPS'] == 100000
-    assert settings['NSTEPS_BURN'] == 1000
-    assert isclose(settings['G'],0.5)
-    assert isclose(settings['OMEGA'],1.0)
-    assert isclose(settings['TIME'],50.0)
-    assert settings['INTERACTIVE'] == False
+    assert settings.NSTEPS == 100000
+    assert settings.NSTEPS_BURN == 1000
+    assert isclose(settings.G,0.5)
+    assert isclose(settings.OMEGA,1.0)
+    assert isclose(settings.TIME,50.0)
+    assert settings.INTERACTIVE == False
     assert seed_dict['SEED'] == None
 
     assert path_plot['PLOT_FOLDER'] == "./plot"
@@ -61,7 +72,8 @@ def test_check_positive_parameters():
     THEN: it raises a ValueError
     """
     
-    invalid_settings = {'NSTEPS' : 0, 'OMEGA' : -1.0, 'G' : 1.0, 'TIME' : -10.0}
+    invalid_settings = Settings(NSTEPS=0, NSTEPS_BURN=0, OMEGA=-1.0, G=1.0,
+                                TIME=-10.0, INTERACTIVE=False)
     with pytest.raises(ValueError):
         check_positive_parameters(invalid_settings)
 
@@ -89,4 +101,129 @@ def test_ensure_storage_directories_exist():
     rmdir(path_data['DATA_FOLDER'])
 
     assert not path.exists(path_plot['PLOT_FOLDER'])
-    assert not path.exists(path_data['DATA_FOLDER'])
\ No newline at end of file
+    assert not path.exists(path_data['DATA_FOLDER'])
+
+def test_ensure_storage_directories_exist_removed(tmp_path):
+    """This test checks that ensure_storage_directories_exist
+    creates again a directory removed after a previous call
+
+    GIVEN: test directories paths ensured once
+    WHAT: remove the plot directory and apply
+        ensure_storage_directories_exist again
+    THEN: both directories exist
+    """
+    path_plot = {'PLOT_FOLDER': str(tmp_path / 'plots')}
+    path_data = {'DATA_FOLDER': str(tmp_path / 'data')}
+    ensure_storage_directories_exist(path_plot, path_data)
+
+    rmdir(path_plot['PLOT_FOLDER'])
+    ensure_storage_directories_exist(path_plot, path_data)
+
+    assert path.isdir(path_plot['PLOT_FOLDER'])
+    assert path.isdir(path_data['DATA_FOLDER'])
+
+def test_load_config():
+    """This test checks that load_config parses each
+    configuration file only once
+
+    GIVEN: the name of the test configuration file
+    WHAT: apply load_config twice
+    THEN: get the same Config object with the values of the file
+    """
+    config = load_config('configuration_test.txt')
+
+    assert load_config('configuration_test.txt') is config
+    assert config.get_settings().NSTEPS == 100000
+
+def test_load_config_modified_file(tmp_path):
+    """This test checks that load_config parses again a
+    configuration file after it is modified
+
+    GIVEN: a copy of the test configuration file
+    WHAT: apply load_config before and after changing
+        the number of steps in the file
+    THEN: get a new Config object with the new number of steps
+    """
+    filename = tmp_path / 'configuration.txt'
+    content = Path('configuration_test.txt').read_text()
+    filename.write_text(content)
+    config = load_config(str(filename))
+
+    filename.write_text(content.replace('NSTEPS = 100000', 'NSTEPS = 200000'))
+    utime(filename, ns=(0, stat(filename).st_mtime_ns + 1))
+    modified_config = load_config(str(filename))
+
+    assert modified_config is not config
+    assert modified_config.get_settings().NSTEPS == 200000
+
+def _modified_config_file(tmp_path, old : str, new : str) -> str:
+    """This function writes a copy of the test configuration
+    file replacing a piece of its content
+
+    Parameters:
+        tmp_path: temporary directory of the test
+        old, new: content to replace and its replacement
+
+    Return:
+        name of the modified configuration file
+    """
+    filename = tmp_path / 'configuration.txt'
+    filename.write_text(Path('configuration_test.txt').read_text().replace(old, new))
+    return str(filename)
+
+def test_config_lowercase_keys(tmp_path):
+    """This test checks that the keys of the configuration
+    file are case-insensitive as in configparser
+
+    GIVEN: a copy of the test configuration file with
+        the number of steps written with a lowercase key
+    WHEN: build the Config object of the file
+    THEN: get the number of steps of the file
+    """
+    config = Config(_modified_config_file(tmp_path, 'NSTEPS = 100000', 'nsteps = 100000'))
+
+    assert config.get_settings().NSTEPS == 100000
+
+def test_config_interpolation(shared_config):
+    """This test checks that the references to other keys
+    of the configuration file are resolved
+
+    GIVEN: the config object parsed from the test configuration file
+    WHEN: call get_path_plot and get_path_data
+    THEN: the references to keys of the same section and of
+        other sections are replaced by their values
+    """
+    assert shared_config.get_path_data()['ENERGY+PHONONS'] == './data/energy_phonons.txt'
+    assert shared_config.get_path_plot()['PHONONS'] == \
+        './plot/phonons_distribution_g_0.5_omega_1.0_time_50.0_nsteps_100000_nsteps_burn_1000.png'
+
+def test_config_interpolation_lowercase_reference(tmp_path):
+    """This test checks that the references to other keys
+    of the configuration file are case-insensitive
+
+    GIVEN: a copy of the test configuration file with a
+        reference written with a lowercase key
+    WHEN: build the Config object of the file
+    THEN: the reference is replaced by the value of the key
+    """
+    config = Config(_modified_config_file(tmp_path, '${DATA_FOLDER}', '${data_folder}'))
+
+    assert config.get_path_data()['ENERGY+PHONONS'] == './data/energy_phonons.txt'
+
+@pytest.mark.parametrize("old, new, message", [
+    ('${DATA_FOLDER}', '${NOPE}', r'\$\{NOPE\} of \[path_data\] ENERGY\+PHONONS'),
+    ('${settings:G}', '${nope:G}', r'\$\{nope:G\} of \[path_plot\] PHONONS'),
+    ('DATA_FOLDER = ./data', 'DATA_FOLDER = ${ENERGY+PHONONS}', r'nested more than 10 times')],
+    ids=['missing_key', 'missing_section', 'cycle'])
+def test_config_invalid_interpolation(tmp_path, old, new, message):
+    """This test checks that an invalid reference of the
+    configuration file raises a ValueError naming the reference
+
+    GIVEN: a copy of the test configuration file with a reference to
+        a missing key, to a missing section or with two keys that
+        reference each other
+    WHEN: build the Config object of the file
+    THEN: a ValueError is raised naming the option and the reference
+    """
+    with pytest.raises(ValueError, match=message):
+        Config(_modified_config_file(tmp_path, old, new))
@@ -1,29 +1,54 @@
 import pytest
+import copy
 import numpy as np
-from unittest.mock import patch
-from polaron import Polaron
-from math import isclose
+from math import exp, isclose, log
 
-@pytest.fixture
-def polaron():
-    """This method returns a fixed polaron object
-    that can be used consistently during the tests
+#generation and removal times of the phonons used in the tests
+_PHONON = (0.2, 0.5)
+_ANOTHER_PHONON = (0.6, 0.7)
 
-    Return:
-        polaron object with zero order
+#analytic weight ratios of _PHONON for the polaron with omega=1.0, g=0.5, time=10.0
+_EXPECTED_WEIGTH_RATIO_ADD = (0.5 * 10.0) ** 2 * exp(-10.0 * 1.0 * (0.5 - 0.2))
+_EXPECTED_WEIGTH_RATIO_REMOVE = exp(10.0 * 1.0 * (0.5 - 0.2)) / ((0.5 * 10.0) ** 2)
+
+class ScriptedGenerator:
+    """This class replaces the random number generator of a polaron
+    in the tests returning fixed values from the methods used by
+    the updates
+
+    Parameters:
+        random : values returned in order by the calls to random
+        integers : value returned by integers
+        standard_exponential : value returned by standard_exponential
     """
-    return Polaron(omega=1.0, g=0.5, time=10.0)
+    def __init__(self, random=(), integers=0, standard_exponential=0.0):
+        self._random = iter(random)
+        self._integers = integers
+        self._standard_exponential = standard_exponential
 
-@pytest.fixture
+    def random(self, size=None):
+        if size is None:
+            return next(self._random)
+        return np.array([next(self._random) for _ in range(np.prod(size))]).reshape(size)
+
+    def integers(self, low, high=None, size=None):
+        if size is None:
+            return self._integers
+        return np.full(size, self._integers)
+
+    def standard_exponential(self):
+        return self._standard_exponential
+
+@pytest.fixture(scope="session")
 def phonon():
-    """This method returns a np.array of two times
+    """This method returns a tuple of two times
     that can be used consistently as a phonon during
     the tests
 
     Return:
         phonon with generation and removal times
     """
-    return np.array([0.2,0.5])
+    return _PHONON
 
 def test_polaron_initialization(polaron):
     """This test checks that the attribute of the Polaron
@@ -37,14 +62,32 @@ def test_polaron_initialization(polaron):
         to the given parameters
     THEN: get a valid polaron object
     """
-    assert isclose(polaron.diagram['omega'], 1.0)
-    assert isclose(polaron.diagram['g'], 0.5)
-    assert isclose(polaron.diagram['time'], 10.0)
-    assert polaron.diagram['order'] == 0
-    assert isclose(polaron.diagram['total_energy'], 0.0)
-    assert polaron.phonon_list == []
-    assert polaron.order_sequence == []
-    assert polaron.energy_sequence == []
+    assert isclose(polaron.omega, 1.0)
+    assert isclose(polaron.g, 0.5)
+    assert isclose(polaron.time, 10.0)
+    assert polaron.order == 0
+    assert isclose(polaron.total_energy, 0.0)
+    assert len(polaron.phonon_list) == 0
+    assert polaron.diagram == {'omega' : polaron.omega, 'g' : polaron.g,
+                               'time' : polaron.time, 'order' : 0,
+                               'total_energy' : polaron.total_energy}
+    assert len(polaron.order_sequence) == 0
+    assert len(polaron.energy_sequence) == 0
+
+def test_polaron_slots(polaron):
+    """This test checks that the attributes of the Polaron
+    class are fixed by its slots
+
+    Parameters:
+        polaron: fixture polaron
+
+    GIVEN: polaron object
+    WHAT: set an attribute that is not declared in the slots
+    THEN: an AttributeError is raised
+    """
+    assert not hasattr(polaron, '__dict__')
+    with pytest.raises(AttributeError):
+        polaron.phonons = []
 
 def test_metropolis(polaron):
     """This test checks that Metropolis returns the correct values
@@ -90,35 +133,9 @@ def test_weigth_ratio_add(polaron, phonon):
     THEN: the ratio has to be equal to the expected ratio 
         evaluated through the formula
     """
-    ratio = polaron.weigth_ratio_add(phonon)
-    expected_ratio = (0.5 * 10.0) ** 2 * np.exp(-10.0 * 1.0 * (0.5 - 0.2))
-    assert isclose(ratio,expected_ratio) 
+    ratio = polaron.weigth_ratio_add(*phonon)
+    assert isclose(ratio, _EXPECTED_WEIGTH_RATIO_ADD)
     
-def test_proposal_add_ratio_zero_order(polaron,phonon):
-    """This test checks whether the ratio between the proposal
-    probabilities of the reverse and direct process for the 
-    add_phonon update has the expected value
-
-    Parameters:
-        polaron: fixture polaron
-        phonon: fixture phonon
-    
-    GIVEN: a polaron object with specific parameters
-        and a phonon with specific times
-    WHAT: apply the function proposal_add_ratio to evaluate 
-        the ratio
-    THEN: the ratio has to be equal to the expected ratio 
-        evaluated through the formula
-
-    Notes:
-        This test refers to the fixture polaron with 
-        a zero order diagram
-    """
-    ratio = polaron.proposal_add_ratio(phonon)
-    assert polaron.diagram['order'] == 0
-    expected_ratio = 0.5 * (1 - 0.2)/(0 + 1)
-    assert isclose(ratio,expected_ratio)
-
 def test_add_internal_zero_order(polaron, phonon):
     """This test checks that the add_internal method
     adds a phonon to the phonon_list and updates the order
@@ -138,81 +155,74 @@ def test_add_internal_zero_order(polaron, phonon):
         This test refers to the fixture polaron with 
         a zero order diagram
     """
-    assert polaron.phonon_list == []
-    polaron.add_internal(phonon)
+    assert len(polaron.phonon_list) == 0
+    polaron.add_internal(*phonon)
     expected_phonon_list=[phonon]
-    assert all(np.allclose(actual,expected) for actual,expected in 
-                              zip(polaron.phonon_list,expected_phonon_list))
-    assert polaron.diagram['order'] == 2
+    assert np.array_equal(polaron.phonon_list, expected_phonon_list)
+    assert polaron.order == 2
 
 @pytest.fixture
-def polaron_order_two(phonon):
+def polaron_order_two(polaron, phonon):
     """This method return a fixed polaron object
     with a phonon that can be used consistently
     during the tests
 
     Parameters:
+        polaron: polaron fixture
         phonon: phonon fixture
     Return:
         polaron: polaron object with order two 
             and a phonon
+
+    Notes:
+    The polaron is a copy of the shared one, so it can be used
+    together with the other polarons of the tests
     """
-    polaron = Polaron(omega=1.0, g=0.5, time=10.0)
-    polaron.add_internal(phonon)
+    polaron = copy.deepcopy(polaron)
+    polaron.add_internal(*phonon)
     return polaron
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def another_phonon():
-    """This method return a np.array of two times
+    """This method return a tuple of two times
     that can be used consistently as a phonon during
     the tests
 
     Return:
         phonon with generation and removal times
     """
-    return np.array([0.6,0.7])
+    return _ANOTHER_PHONON
 
-def test_proposal_add_ratio_zero_order(polaron, phonon):
+@pytest.mark.parametrize("parameters", [
+    {'polaron': "polaron", 'phonon': "phonon",
+     'expected_ratio': 0.5 * (1 - 0.2)/(0 + 1)},
+    {'polaron': "polaron_order_two", 'phonon': "another_phonon",
+     'expected_ratio': (1 - 0.6)/(1 + 1)}])
+def test_proposal_add_ratio(parameters, request):
     """This test checks whether the ratio between the proposal
     probabilities of the reverse and direct process for the 
-    add_phonon update has the expected value for a polaron
-    of order zero
+    add_phonon update has the expected value both for a polaron
+    of order zero, where the prefactor 1/2 appears, and for
+    a polaron with order greater than zero
 
     Parameters:
-        polaron: fixture polaron
-        phonon: fixture phonon
+        parameters: dictionary with the polaron and the phonon
+            to consider and the expected ratio
+        request: pytest fixture used to access the value of a fixture
+            having its name passed as a string
     
-    GIVEN: a polaron object of order zero and a phonon 
+    GIVEN: a polaron object of order zero or two and a phonon 
         with specific times
     WHAT: apply the function proposal_add_ratio to evaluate 
         the ratio
     THEN: the ratio has to be equal to the expected ratio 
         evaluated through the formula
     """
-    ratio = polaron.proposal_add_ratio(phonon)
-    expected_ratio = 0.5 * (1 - 0.2)/(0 + 1)
-    assert isclose(ratio,expected_ratio)
-
-def test_proposal_add_ratio_order_not_zero(polaron_order_two, another_phonon):
-    """This test checks whether the ratio between the proposal
-    probabilities of the reverse and direct process for the 
-    add_phonon update has the expected value for a polaron
-    with order greater than zero
+    polaron = request.getfixturevalue(parameters['polaron'])
+    phonon = request.getfixturevalue(parameters['phonon'])
 
-    Parameters:
-        polaron_order_two: fixture polaron_order_two
-        another_phonon: fixture another_phonon
-    
-    GIVEN: a polaron object with order greater than zero
-        and a phonon with specific times
-    WHAT: apply the function proposal_add_ratio to evaluate 
-        the ratio
-    THEN: the ratio has to be equal to the expected ratio 
-        evaluated through the formula
-    """
-    ratio = polaron_order_two.proposal_add_ratio(another_phonon)
-    expected_ratio = (1 - 0.6)/(len(polaron_order_two.phonon_list) + 1)
-    assert isclose(ratio,expected_ratio)
+    ratio = polaron.proposal_add_ratio(phonon[0])
+    assert isclose(ratio, parameters['expected_ratio'])
 
 @pytest.mark.parametrize("polarons", ["polaron", "polaron_order_two"])
 def test_add_internal(polarons, another_phonon, request):
@@ -238,103 +248,64 @@ def test_add_internal(polarons, another_phonon, request):
     polaron = request.getfixturevalue(polarons)
     #store initial parameters
     initial_phonon_list_length = len(polaron.phonon_list)
-    initial_diagram_order = polaron.diagram['order']
+    initial_diagram_order = polaron.order
     #store initial phonon list
-    initial_phonon_list = polaron.phonon_list[:]
+    initial_phonon_list = polaron.phonon_list.copy()
 
     #call to the function
-    polaron.add_internal(another_phonon)
+    polaron.add_internal(*another_phonon)
 
     #check diagram order and lenght of phonon list is updated correctly
     assert len(polaron.phonon_list) == initial_phonon_list_length + 1
-    assert polaron.diagram['order'] == initial_diagram_order + 2
-    #check lists are equal phonon by phonon
-    expected_phonon_list=initial_phonon_list + [another_phonon]
-    assert all(np.allclose(actual,expected) for actual,expected in 
-                              zip(polaron.phonon_list, expected_phonon_list))
-
-@pytest.fixture
-def parameters_eval_add_internal():
-    """This fixture returns a list of dictionaries where each contains the
-    relevant structure and internal parameters used in the tests of
-    eval_add_internal:
-
-     1) time at which the phonon is generated
-     2) time at which the phonon is removed
-     3) the acceptance probability that the add_internal update is accepted.
-        It is evaluated manually considering the two times of the phonon
-        and a polaron of order zero
-     4) the sampled acceptance probability from Metropolis-Hastings
-        that we simulate when the update is not automatically accepted
-
-    They refers to each of the outcomes of Metropolis-Hastings that we want to test:
-    - accepted
-    - accepted when the random sampled acceptance is smaller than the actual one
-    - rejected when the random sampled acceptance is bigger than the actual one
-    """
-
-    return [{'t_gen': 0.3, 't_rem': 0.5, 'actual_acceptance': 1.0},
-    {'t_gen': 0.6, 't_rem': 0.8, 'actual_acceptance': 0.68, 'sampled_acceptance' : 0.67},
-    {'t_gen': 0.6, 't_rem': 0.8, 'actual_acceptance': 0.68, 'sampled_acceptance' : 0.69}]
-
-def test_eval_add_internal_accepted(polaron, parameters_eval_add_internal):
-    """This test checks the behaviour of the eval_add_internal method when:
-    - acceptance probability for the update is 1.0
-    - update is accepted directly
-     
-    The eval_add_internal function is responsible for:
-    - evaluating the acceptance probability for the addition of a specific phonon
-    - add it into the current diagram for this outcome of Metropolis-Hastings 
-      because the acceptance probability is 1.0
-
-    The test involves patching:
-    - numpy.random.uniform to control the values of the random sampled
-      times of the phonon 
-
-    This is fundamental to calculate manually the actual acceptance probability
-    for the update and to test that the updated state of the object is the 
-    expected one after the call to the function.
-
-    Parameters:
-        polaron: polaron fixture with zero order
-        parameters_eval_add_internal: list of dictionaries with times of the
-            phonon and relevant values for acceptance probabilities
-
-    GIVEN: a polaron with order zero, two specific times for the generated phonon,
-      the acceptance probability for its addition given by Metropolis-Hastings of 1.0
-    WHAT: apply the eval_add_internal function patching 
-      the random times of the phonon
-    THEN: get a polaron object with one more phonon and order increased by two
-    """
-    # Get the initial state
-    initial_phonon_list_length = len(polaron.phonon_list)
-    initial_order = polaron.diagram['order']
-
-    with patch('numpy.random.uniform') as mock_uniform:
-        mock_uniform.side_effect = [parameters_eval_add_internal[0]['t_gen'], 
-                        parameters_eval_add_internal[0]['t_rem']]
-        # Call the method under test
-        polaron.eval_add_internal()
-
-    assert len(polaron.phonon_list) == initial_phonon_list_length + 1
-    assert polaron.diagram['order'] == initial_order + 2
-
+    assert polaron.order == initial_diagram_order + 2
+    #check arrays of phonons are equal
+    expected_phonon_list=np.vstack((initial_phonon_list, another_phonon))
+    assert np.array_equal(polaron.phonon_list, expected_phonon_list)
+
+#cases of eval_add_internal, one for each of the outcomes of Metropolis-Hastings:
+#accepted, accepted when the sampled acceptance is smaller than the actual one and
+#rejected when the sampled acceptance is bigger than the actual one. Each case has
+# 1) time at which the phonon is generated
+# 2) time at which the phonon is removed and the corresponding fraction
+#    of the interval between the generation time and 1 that is sampled
+# 3) the acceptance probability that the add_internal update is accepted,
+#    evaluated manually with two digits for the two times of the phonon
+#    and a polaron of order zero
+# 4) the sampled acceptance probability from Metropolis-Hastings,
+#    that is the largest one 1.0 when the update is automatically accepted
+# 5) whether the update is accepted
+@pytest.mark.parametrize("parameters", [
+    {'t_gen': 0.3, 't_rem': 0.5, 'rem_fraction': (0.5 - 0.3)/(1 - 0.3),
+     'actual_acceptance': 1.0, 'sampled_acceptance' : 1.0, 'accepted' : True},
+    {'t_gen': 0.6, 't_rem': 0.8, 'rem_fraction': (0.8 - 0.6)/(1 - 0.6),
+     'actual_acceptance': 0.68, 'sampled_acceptance' : 0.67, 'accepted' : True},
+    {'t_gen': 0.6, 't_rem': 0.8, 'rem_fraction': (0.8 - 0.6)/(1 - 0.6),
+     'actual_acceptance': 0.68, 'sampled_acceptance' : 0.69, 'accepted' : False}],
+    ids=['accepted', 'accepted_conditional', 'rejected'])
+def test_eval_add_internal(polaron, parameters, monkeypatch):
+    """This test checks the behaviour of the eval_add_internal method for
+    each of the outcomes of Metropolis-Hastings:
+    - acceptance probability for the update is 1.0 and the update
+      is accepted directly
+    - acceptance probability for the update is less than 1.0 and the update
+      is accepted after sampling an acceptance probability smaller
+      than the one returned by Metropolis-Hastings
+    - acceptance probability for the update is less than 1.0 and the update
+      is rejected after sampling an acceptance probability bigger
+      than the one returned by Metropolis-Hastings
 
-def test_eval_add_internal_accepted_conditional(polaron, parameters_eval_add_internal):
-    """This test checks the behaviour of the eval_add_internal method when:
-    - acceptance probability for the update is less than 1.0
-    - update is accepted after sampling an acceptance probability smaller
-      than the one returned by Metropolis-Hastings.
-     
     The eval_add_internal function is responsible for:
     - evaluating the acceptance probability for the addition of a specific phonon
-    - add it into the current diagram for this outcome of Metropolis-Hastings 
-      because we simulate the sampling of an acceptance probability smaller
-      than the one returned by Metropolis-Hastings.
+    - add it into the current diagram or leave the diagram unaltered
+      depending on the outcome of Metropolis-Hastings
 
     The test involves patching:
-    - numpy.random.uniform to control the values of the random sampled
-      times of the phonon and of the sampled acceptance probability 
+    - the random method of the random number generator of the polaron
+      to control the values of the random sampled
+      times of the phonon
+    - the standard_exponential method of the random number generator
+      of the polaron to control the value of the sampled acceptance
+      probability, that is the exponential of minus the sampled number
 
     This is fundamental to calculate manually the actual acceptance probability
     for the update and to test that the updated state of the object is the 
@@ -342,81 +313,44 @@ def test_eval_add_internal_accepted_conditional(polaron, parameters_eval_add_int
 
     Parameters:
         polaron: polaron fixture with zero order
-        parameters_eval_add_internal: list of dictionaries with times of the
-            phonon and relevant values for acceptance probabilities
-
-    GIVEN: a polaron with order zero, two specific times for the generated phonon,
-      the acceptance probability for its addition given by Metropolis-Hastings of 0.54
-      and a sampled acceptance probability of 0.53
-    WHAT: apply the eval_add_internal function patching the random times of 
-      the phonon and the random acceptance probability
-    THEN: get a polaron object with one more phonon and order increased by two
+        parameters: dictionary with the times of the phonon and
+            relevant values for acceptance probabilities
+        monkeypatch: pytest fixture that restores the generator of
+            the shared polaron after the test
+
+    GIVEN: a polaron with order zero, two specific times for the generated
+      phonon, the acceptance probability for its addition given by
+      Metropolis-Hastings and a sampled acceptance probability
+    WHAT: apply the eval_add_internal function to the polaron of order zero
+      patching the random times of the phonon and the random acceptance probability
+    THEN: the acceptance probability of the phonon is the expected one and
+      get a polaron object with one more phonon and order increased by two
+      if the update is accepted and with the same order and number of phonons
+      otherwise
     """
-    # Get the initial state
-    initial_phonon_list_length = len(polaron.phonon_list)
-    initial_order = polaron.diagram['order']
-    
-    with patch('numpy.random.uniform') as mock_uniform:
-        mock_uniform.side_effect = [parameters_eval_add_internal[1]['t_gen'], 
-                        parameters_eval_add_internal[1]['t_rem'], 
-                        parameters_eval_add_internal[1]['sampled_acceptance']]
-        polaron.eval_add_internal()
-
-    assert len(polaron.phonon_list) == initial_phonon_list_length + 1
-    assert polaron.diagram['order'] == initial_order + 2
-
-def test_eval_add_internal_rejected(polaron, parameters_eval_add_internal):
-    """This test checks the behaviour of the eval_add_internal method when:
-    - acceptance probability for the update is less than 1.0
-    - update is rejected after sampling an acceptance probability bigger
-      than the one returned by Metropolis-Hastings.
-     
-    The eval_add_internal function is responsible for:
-    - evaluating the acceptance probability for the addition of a specific phonon
-    - leave unaltered the current diagram for this outcome of Metropolis-Hastings 
-      because we simulate the sampling of an acceptance probability bigger
-      than the one returned by Metropolis-Hastings.
+    acceptance = polaron.metropolis(
+        polaron.weigth_ratio_add(parameters['t_gen'], parameters['t_rem'])
+        * polaron.proposal_add_ratio(parameters['t_gen']))
+    assert isclose(acceptance, parameters['actual_acceptance'], abs_tol=0.005)
 
-    The test involves patching:
-    - numpy.random.uniform to control the values of the random sampled
-      times of the phonon and of the sampled acceptance probability 
-
-    This is fundamental to calculate manually the actual acceptance probability
-    for the update and to test that the updated state of the object is the 
-    expected one after the call to the function.
-
-    Parameters:
-        polaron: polaron fixture with zero order
-        parameters_eval_add_internal: list of dictionaries with times of the
-            phonon and relevant values for acceptance probabilities
-
-    GIVEN: a polaron with order zero, two specific times for the generated phonon,
-      the acceptance probability for its addition given by Metropolis-Hastings of 0.54
-      and a sampled acceptance probability of 0.55
-    WHAT: apply the eval_add_internal function patching the random times of 
-      the phonon and the random acceptance probability
-    THEN: get a polaron object with the same order and number of phonons
-    """
-    # Get the initial state
-    initial_phonon_list_length = len(polaron.phonon_list)
-    initial_order = polaron.diagram['order']
+    monkeypatch.setattr(polaron, 'rng', ScriptedGenerator(
+        random=[parameters['t_gen'], parameters['rem_fraction']],
+        standard_exponential=-log(parameters['sampled_acceptance'])))
 
-    with patch('numpy.random.uniform') as mock_uniform:
-        mock_uniform.side_effect = [parameters_eval_add_internal[2]['t_gen'], 
-                        parameters_eval_add_internal[2]['t_rem'], 
-                        parameters_eval_add_internal[2]['sampled_acceptance']]
-        polaron.eval_add_internal()
+    polaron.eval_add_internal()
 
-    assert len(polaron.phonon_list) == initial_phonon_list_length
-    assert polaron.diagram['order'] == initial_order
+    added_phonons = 1 if parameters['accepted'] else 0
+    assert len(polaron.phonon_list) == added_phonons
+    assert polaron.order == 2*added_phonons
 
 @pytest.fixture
-def polaron_order_four(phonon, another_phonon):
+def polaron_order_four(polaron, phonon, another_phonon):
     """This method return a fixed polaron object
     with two phonons that can be used consistently
     during the tests
     
     Parameters:
+        polaron: fixture polaron
         phonon: fixture phonon with specific times
         another_phonon: fixture another_phonon with specific times
     
@@ -424,10 +358,14 @@ def polaron_order_four(phonon, another_phonon):
         polaron: polaron object with an updated phonon list
             that contains phonon and another_phonon and 
             a diagram order of four
+
+    Notes:
+    The polaron is a copy of the shared one, so it can be used
+    together with the other polarons of the tests
     """
-    polaron = Polaron(omega=1.0, g=0.5, time=10.0)
-    polaron.add_internal(phonon)
-    polaron.add_internal(another_phonon)
+    polaron = copy.deepcopy(polaron)
+    polaron.add_internal(*phonon)
+    polaron.add_internal(*another_phonon)
     return polaron
 
 def test_weigth_ratio_remove(polaron_order_two, phonon):
@@ -444,9 +382,8 @@ def test_weigth_ratio_remove(polaron_order_two, phonon):
     THEN: the ratio has to be equal to the expected ratio 
         evaluated through the formula
     """
-    ratio = polaron_order_two.weigth_ratio_remove(phonon)
-    expected_ratio =  np.exp(10.0 * 1.0 * (0.5 - 0.2)) / ((0.5 * 10.0) ** 2)
-    assert isclose(ratio,expected_ratio)
+    ratio = polaron_order_two.weigth_ratio_remove(*phonon)
+    assert isclose(ratio, _EXPECTED_WEIGTH_RATIO_REMOVE)
 
 
 def test_proposal_remove_ratio_order_two(polaron_order_two, phonon):
@@ -466,7 +403,7 @@ def test_proposal_remove_ratio_order_two(polaron_order_two, phonon):
     THEN: the ratio has to be equal to the expected ratio 
         evaluated through the formula
     """
-    ratio = polaron_order_two.proposal_remove_ratio(phonon)
+    ratio = polaron_order_two.proposal_remove_ratio(phonon[0])
     expected_ratio = 2 * 1/(1 - 0.2)
     assert isclose(ratio,expected_ratio)
 
@@ -487,7 +424,7 @@ def test_proposal_remove_ratio_order_greater_two(polaron_order_four, phonon):
     THEN: the ratio has to be equal to the expected ratio 
         evaluated through the formula
     """
-    ratio = polaron_order_four.proposal_remove_ratio(phonon)
+    ratio = polaron_order_four.proposal_remove_ratio(phonon[0])
     expected_ratio = (len(polaron_order_four.phonon_list))/(1 - 0.2)
     assert isclose(ratio,expected_ratio)
 
@@ -498,7 +435,7 @@ def test_choose_phonon(polaron_order_four, phonon_index):
     in phonon_list.
 
     This tests mocks the random sampling of integers 
-    from np.random.randint
+    from the integers method of the random number generator
     
     Parameters:
         polaron_order_four: fixture polaron_order_four
@@ -512,10 +449,8 @@ def test_choose_phonon(polaron_order_four, phonon_index):
     THEN: the actual index has to be equal to the 
         expected index provided as a parameter
     """
-    with patch('numpy.random.randint') as mock_randint:
-       
-        mock_randint.return_value = phonon_index
-        actual_index = polaron_order_four.choose_phonon()
+    polaron_order_four.rng = ScriptedGenerator(integers=phonon_index)
+    actual_index = polaron_order_four.choose_phonon()
 
     assert actual_index == phonon_index
 
@@ -543,188 +478,107 @@ def test_remove_internal(parameters, request):
     polaron = request.getfixturevalue(parameters['polaron'])
     #store initial parameters
     initial_phonon_list_length = len(polaron.phonon_list)
-    initial_diagram_order = polaron.diagram['order']
+    initial_diagram_order = polaron.order
     #get expected phonon list after removal
-    expected_phonon_list = [phonon for i,phonon in 
-                            enumerate(polaron.phonon_list) if i!=0]
+    expected_phonon_list = np.delete(polaron.phonon_list, 
+                                     parameters['phonon_index'], axis=0)
     #call to the function, removing first phonon [0.2,0.5]
     polaron.remove_internal(parameters['phonon_index'])
 
     #check diagram order and lenght of phonon list is updated correctly
     assert len(polaron.phonon_list) == initial_phonon_list_length - 1
-    assert polaron.diagram['order'] == initial_diagram_order - 2
-    #check lists are equal phonon by phonon
-    assert all(np.allclose(actual,expected) for actual,expected in 
-                              zip(polaron.phonon_list, expected_phonon_list))
-
-@pytest.fixture
-def parameters_eval_remove_internal(polaron_order_two, polaron_order_four):
-    """This fixture returns a list of dictionaries where each contains the
-    relevant structure and internal parameters used in the tests of
-    eval_remove_internal:
-
-     1) polaron object to apply eval_remove_internal to 
-     2) a phonon index that refers to the phonon to remove
-     3) the acceptance probability that the remove_internal update is accepted.
-        It is evaluated manually for the selected phonon and polaron
-     4) the sampled acceptance probability from Metropolis-Hastings
-        that we simulate when the update is not automatically accepted
-
-    Each dictionary refers to one of the outcomes of Metropolis-Hastings 
-    that we want to test for the remove_internal update:
-    - accepted
-    - accepted when the random sampled acceptance is smaller than the actual one
-    - rejected when the random sampled acceptance is bigger than the actual one
-
-    Parameters:
-        polaron_order_two: fixture polaron_order_two
-        polaron_order_four: fixture polaron_order_four
-    """
-    return [{'polaron': polaron_order_two, 'phonon_index' : 0, 'actual_acceptance': 1.0},
-    {'polaron': polaron_order_four, 'phonon_index' : 1, 'actual_acceptance': 0.54, 'sampled_acceptance' : 0.53},
-    {'polaron': polaron_order_four, 'phonon_index' : 1, 'actual_acceptance': 0.54, 'sampled_acceptance' : 0.55}]
-
-def test_eval_remove_internal_accepted(parameters_eval_remove_internal):
-    """This test checks the behaviour of the eval_remove_internal method when:
-    - acceptance probability for the update is 1.0
-    - update is accepted directly
-     
-    The eval_remove_internal function is responsible for:
-    - evaluating the acceptance probability for the removal of a specific phonon
-    - remove it from the current diagram for this outcome of Metropolis-Hastings 
-      because the acceptance probability is 1.0
-
-    The test involves patching:
-    -numpy.random.integer to control the value of random integer
-      that corresponds to the index of the phonon to remove
-
-    This is fundamental to calculate manually the acceptance probability
-    for the update and to test that the update state of the object is the 
-    expected one after the call to the function.
-
-    Parameters:
-        parameters_eval_remove_internal: list of dictionaries with polarons,
-            phonon_index and relevant values for acceptance probabilities
-
-    GIVEN: a polaron with order two and a phonon for which
-      the acceptance probability given by Metropolis-Hastings is 1.0
-    WHAT: apply the eval_remove_internal function patching the random 
-      phonon index
-    THEN: get a polaron object with one less phonon and order decreased by two
-    """
-    # Get the initial state
-    polaron=parameters_eval_remove_internal[0]['polaron']
-    initial_phonon_list_length = len(polaron.phonon_list)
-    initial_order = polaron.diagram['order']
-
-    with patch('numpy.random.randint') as mock_randint:
-        mock_randint.return_value = parameters_eval_remove_internal[0]['phonon_index']
-        # Call the method under test
-        polaron.eval_remove_internal()
-
-        assert len(polaron.phonon_list) == initial_phonon_list_length - 1
-        assert polaron.diagram['order'] == initial_order - 2
-
-def test_eval_remove_internal_accepted_conditional(parameters_eval_remove_internal):
-    """This test checks the behaviour of the eval_remove_internal method when:
-    - acceptance probability for the update is less than 1.0
-    - update is accepted after sampling an acceptance probability smaller
-      than the one returned by Metropolis-Hastings.
+    assert polaron.order == initial_diagram_order - 2
+    #check arrays of phonons are equal as multisets, since the removed
+    #phonon is replaced by the last one the order of the phonons is not kept
+    actual_phonon_list = polaron.phonon_list
+    assert np.array_equal(actual_phonon_list[np.argsort(actual_phonon_list[:, 0])],
+                          expected_phonon_list[np.argsort(expected_phonon_list[:, 0])])
+
+#cases of eval_remove_internal, one for each of the outcomes of Metropolis-Hastings:
+#accepted, accepted when the sampled acceptance is smaller than the actual one and
+#rejected when the sampled acceptance is bigger than the actual one. Each case has
+# 1) name of the polaron fixture to apply eval_remove_internal to
+# 2) a phonon index that refers to the phonon to remove
+# 3) the acceptance probability that the remove_internal update is accepted,
+#    evaluated manually with two digits for the selected phonon and polaron
+# 4) the sampled acceptance probability from Metropolis-Hastings,
+#    that is the largest one 1.0 when the update is automatically accepted
+# 5) whether the update is accepted
+@pytest.mark.parametrize("parameters", [
+    {'polaron': "polaron_order_two", 'phonon_index' : 0, 'actual_acceptance': 1.0,
+     'sampled_acceptance' : 1.0, 'accepted' : True},
+    {'polaron': "polaron_order_four", 'phonon_index' : 1, 'actual_acceptance': 0.54,
+     'sampled_acceptance' : 0.53, 'accepted' : True},
+    {'polaron': "polaron_order_four", 'phonon_index' : 1, 'actual_acceptance': 0.54,
+     'sampled_acceptance' : 0.55, 'accepted' : False}],
+    ids=['accepted', 'accepted_conditional', 'rejected'])
+def test_eval_remove_internal(parameters, request, monkeypatch):
+    """This test checks the behaviour of the eval_remove_internal method for
+    each of the outcomes of Metropolis-Hastings:
+    - acceptance probability for the update is 1.0 and the update
+      is accepted directly
+    - acceptance probability for the update is less than 1.0 and the update
+      is accepted after sampling an acceptance probability smaller
+      than the one returned by Metropolis-Hastings
+    - acceptance probability for the update is less than 1.0 and the update
+      is rejected after sampling an acceptance probability bigger
+      than the one returned by Metropolis-Hastings
      
     The eval_remove_internal function is responsible for:
     - evaluating the acceptance probability for the removal of a specific phonon
       randomly chosen
-    - remove it into the current diagram for this outcome of Metropolis-Hastings 
-      because we simulate the sampling of an acceptance probability smaller
-      than the one returned by Metropolis-Hastings.
+    - remove it from the current diagram or leave the diagram unaltered
+      depending on the outcome of Metropolis-Hastings
 
     The test involves patching:
-    -numpy.random.integer to control the value of random integer
+    -the integers method of the random number generator of the polaron
+      to control the value of random integer
       that corresponds to the index of the phonon to remove
-    -numpy.random.uniform to control the value of the random sampled
-      acceptance probability 
+    -the standard_exponential method of the random number generator
+      of the polaron to control the value of the random sampled
+      acceptance probability, that is the exponential of minus
+      the sampled number
 
     This is fundamental to calculate manually the acceptance probability
     for the update and to test that the updated state of the object is the 
     expected one after the call to the function.
 
     Parameters:
-        parameters_eval_remove_internal: list of dictionaries with polarons,
-            phonon_index and relevant values for acceptance probabilities
-
-    GIVEN: a polaron with order four, a phonon for which
-      the acceptance probability given by Metropolis-Hastings is 0.54
-      and a sampled acceptance probability of 0.53
-    WHAT: apply the eval_remove_internal function patching the random 
-      phonon index and the random acceptance probability
-    THEN: get a polaron object with one less phonon and order decreased by two
-    """
-    # Get the initial state
-    polaron=parameters_eval_remove_internal[1]['polaron']
-    initial_phonon_list_length = len(polaron.phonon_list)
-    initial_order = polaron.diagram['order']
- 
-    with patch('numpy.random.randint') as mock_randint, \
-        patch('numpy.random.uniform') as mock_uniform:
-
-        mock_randint.return_value = parameters_eval_remove_internal[1]['phonon_index']
-        mock_uniform.return_value = parameters_eval_remove_internal[1]['sampled_acceptance']
-
-        polaron.eval_remove_internal()
-
-        assert len(polaron.phonon_list) == initial_phonon_list_length - 1
-        assert polaron.diagram['order'] == initial_order - 2
-
-def test_eval_remove_internal_rejected(parameters_eval_remove_internal):
-    """This test checks the behaviour of the eval_remove_internal method when:
-    - acceptance probability for the update is less than 1.0
-    - update is rejected after sampling an acceptance probability bigger
-      than the one returned by Metropolis-Hastings.
-     
-    The eval_remove_internal function is responsible for:
-    - evaluating the acceptance probability for the removal of a specific phonon
-      randomly chosen
-    - leave unaltered the current diagram for this outcome of Metropolis-Hastings 
-      because we simulate the sampling of an acceptance probability bigger
-      than the one returned by Metropolis-Hastings.
-
-    The test involves patching:
-    -numpy.random.integer to control the value of random integer
-      that corresponds to the index of the phonon to remove
-    -numpy.random.uniform to control the value of the random sampled
-      acceptance probability 
-
-    This is fundamental to calculate manually the acceptance probability
-    for the update and to test that the state of the object is unaltered
-    after the call to the function.
-
-    Parameters:
-        parameters_eval_remove_internal: list of dictionaries with polarons,
-            phonon_index and relevant values for acceptance probabilities
+        parameters: dictionary with the polaron, the phonon_index and
+            relevant values for acceptance probabilities
+        request: pytest fixture used to access the value of a fixture
+            having its name passed as a string
+        monkeypatch: pytest fixture that restores the generator of
+            the polaron after the test
 
-    GIVEN: a polaron with order four, a phonon for which
-      the acceptance probability given by Metropolis-Hastings is 0.54
-      and a sampled acceptance probability of 0.55
+    GIVEN: a polaron of order two or four, a phonon for which
+      the acceptance probability given by Metropolis-Hastings is known
+      and a sampled acceptance probability
     WHAT: apply the eval_remove_internal function patching the random 
       phonon index and the random acceptance probability
-    THEN: get a polaron object with the same order and number of phonons
+    THEN: the acceptance probability of the phonon is the expected one and
+      get a polaron object with one less phonon and order decreased by two
+      if the update is accepted and with the same order and number of phonons
+      otherwise
     """
-    # Get the initial state
-    polaron=parameters_eval_remove_internal[2]['polaron']
+    polaron = request.getfixturevalue(parameters['polaron'])
     initial_phonon_list_length = len(polaron.phonon_list)
-    initial_order = polaron.diagram['order']
+    initial_order = polaron.order
 
-    #mocking functions for phonon index and sampled acceptance
-    with patch('numpy.random.randint') as mock_randint, \
-        patch('numpy.random.uniform') as mock_uniform:
+    t_gen, t_rem = polaron.phonon_list[parameters['phonon_index']]
+    acceptance = polaron.metropolis(polaron.weigth_ratio_remove(t_gen, t_rem)
+                                    * polaron.proposal_remove_ratio(t_gen))
+    assert isclose(acceptance, parameters['actual_acceptance'], abs_tol=0.005)
 
-        mock_randint.return_value = parameters_eval_remove_internal[2]['phonon_index']
-        mock_uniform.return_value = parameters_eval_remove_internal[2]['sampled_acceptance']
+    monkeypatch.setattr(polaron, 'rng', ScriptedGenerator(
+        integers=parameters['phonon_index'],
+        standard_exponential=-log(parameters['sampled_acceptance'])))
 
-        polaron.eval_remove_internal()
+    polaron.eval_remove_internal()
 
-        assert len(polaron.phonon_list) == initial_phonon_list_length
-        assert polaron.diagram['order'] == initial_order
+    removed_phonons = 1 if parameters['accepted'] else 0
+    assert len(polaron.phonon_list) == initial_phonon_list_length - removed_phonons
+    assert polaron.order == initial_order - 2*removed_phonons
 
 def test_eval_diagram_energy_zero_order(polaron):
     """This test checks that the energy of a Polaron object
@@ -740,7 +594,7 @@ def test_eval_diagram_energy_zero_order(polaron):
         consistently with the estimator
     """
     polaron.eval_diagram_energy()
-    assert isclose(polaron.diagram['total_energy'],0.0)
+    assert isclose(polaron.total_energy,0.0)
 
 def test_eval_diagram_energy_order_two(polaron_order_two):
     """This test checks that the energy of a Polaron object
@@ -755,15 +609,52 @@ def test_eval_diagram_energy_order_two(polaron_order_two):
     THEN: the energy of the polaron has to be
         consistent with the one of the estimator
     """
-    assert polaron_order_two.diagram['order'] == 2
+    assert polaron_order_two.order == 2
     phonons_interaction_time_sum = 0.5 - 0.2
     actual_energy = 1.0 * phonons_interaction_time_sum - 2 / 10.0
     #calls to the function eval_diagram_energy
     polaron_order_two.eval_diagram_energy()
-    assert isclose(polaron_order_two.diagram['total_energy'],actual_energy)
+    assert isclose(polaron_order_two.total_energy,actual_energy)
+
+def test_eval_diagram_energy_after_remove(polaron_order_four):
+    """This test checks that the energy of a Polaron object
+    takes the value evaluated by the estimator formula also
+    after a phonon has been removed from the diagram
+
+    Parameters:
+        polaron_order_four: fixture polaron_order_four
+
+    GIVEN: a Polaron object with order four
+    WHAT: remove the first phonon and call the eval_diagram_energy function
+    THEN: the energy of the polaron has to be consistent with the one
+        of the estimator for the remaining phonon
+    """
+    polaron_order_four.remove_internal(0)
+    phonons_interaction_time_sum = 0.7 - 0.6
+    actual_energy = 1.0 * phonons_interaction_time_sum - 2 / 10.0
+    polaron_order_four.eval_diagram_energy()
+    assert isclose(polaron_order_four.total_energy, actual_energy)
+
+def test_set_starting_info(polaron):
+    """This test checks that set_starting_info allocates
+       the arrays for the order and energy sequences with
+       the requested number of sampled diagrams
+
+       Parameters:
+            polaron: fixture polaron
+
+       GIVEN: a polaron object
+       WHAT : apply set_starting_info with a number of steps
+       THEN : order_sequence and energy_sequence have a length
+            equal to the number of steps
+    """
+    polaron.set_starting_info(5)
+
+    assert len(polaron.order_sequence) == 5
+    assert len(polaron.energy_sequence) == 5
 
 def test_update_diagrams_info(polaron_order_two):
-    """This test checks that the lists with diagrams order and energy
+    """This test checks that the arrays with diagrams order and energy
        of the polaron are updated correctly during the simulation.
 
        Parameters:
@@ -771,36 +662,91 @@ def test_update_diagrams_info(polaron_order_two):
 
        Notes:
         The values for order and energy of a Polaron with zero order
-        are inserted as initial values in the lists order_sequence and
-        energy_sequence. After the update is checked that the actual lists 
+        are inserted as initial values in the arrays order_sequence and
+        energy_sequence. After the update is checked that the actual arrays 
         are equal to the expected ones
        
        GIVEN: a polaron object of order two
        WHAT : mock some initial values and then
             apply update_diagrams_info function
-       THEN : have two lists with the correct 
+       THEN : have two arrays with the correct 
             values for order and energy
     """
-    #simulating zero order diagram at first step
-    polaron_order_two.order_sequence.append(0)
-    polaron_order_two.energy_sequence.append(0.0)
-
-    initial_order_list = polaron_order_two.order_sequence.copy()
-    initial_energy_list = polaron_order_two.energy_sequence.copy()
+    polaron_order_two.set_starting_info(2)
 
-    #assert actual lists are equal before updating
-    assert initial_order_list == polaron_order_two.order_sequence
-    assert initial_energy_list == polaron_order_two.energy_sequence
+    #simulating zero order diagram at first step
+    polaron_order_two.order_sequence[0] = 0
+    polaron_order_two.energy_sequence[0] = 0.0
+    polaron_order_two._step = 1
 
     #get order and energy of polaron_order_two
-    order = polaron_order_two.diagram['order']
+    order = polaron_order_two.order
     polaron_order_two.eval_diagram_energy()
-    energy = polaron_order_two.diagram['total_energy']
+    energy = polaron_order_two.total_energy
 
     polaron_order_two.update_diagrams_info()
 
-    expected_order_list = initial_order_list + [order]
-    expected_energy_list = initial_energy_list + [energy]
+    expected_order_list = [0, order]
+    expected_energy_list = [0.0, energy]
 
-    assert polaron_order_two.order_sequence == expected_order_list  
+    assert np.array_equal(polaron_order_two.order_sequence, expected_order_list)
     assert np.allclose(polaron_order_two.energy_sequence, expected_energy_list, rtol=1e-9)
+
+def test_run(polaron):
+    """This test checks that run performs the MonteCarlo steps
+    in the interpreter storing consistent diagrams
+
+    GIVEN: a polaron object of zero order
+    WHAT: apply run storing the sampled diagrams
+    THEN: the orders are twice the number of phonons, the last
+        entries of the sequences are the ones of the final diagram and
+        the phonons have valid times
+    """
+    nsteps = 500
+    polaron.set_starting_info(nsteps)
+
+    polaron.run(nsteps, measure=True)
+
+    phonons = polaron.phonon_list
+    assert polaron.order == 2*polaron.n_phonons
+    assert np.all(polaron.order_sequence % 2 == 0)
+    assert polaron.order_sequence[-1] == polaron.order
+    assert isclose(polaron.energy_sequence[-1], polaron.total_energy)
+    assert isclose(polaron._interaction_time_sum, (phonons[:, 1] - phonons[:, 0]).sum(),
+                   abs_tol=1e-12)
+    assert np.all((0.0 <= phonons[:, 0]) & (phonons[:, 0] <= phonons[:, 1]) & (phonons[:, 1] < 1.0))
+
+def test_run_zero_sample(polaron, monkeypatch):
+    """This test checks that run accepts an add update when the
+    sampled acceptance is exactly 0.0, that is a valid draw of the
+    random number generator
+
+    GIVEN: a polaron object of zero order
+    WHAT: apply run for one add update sampling an acceptance of 0.0
+    THEN: the phonon is added to the diagram
+    """
+    monkeypatch.setattr(polaron, 'rng', ScriptedGenerator(random=[0.3, 0.5, 0.0]))
+
+    polaron.run(1)
+
+    assert polaron.order == 2
+    assert len(polaron.phonon_list) == 1
+
+def test_reset(polaron_order_four):
+    """This test checks that reset brings the polaron back
+    to an empty diagram with empty sequences
+
+    GIVEN: a polaron object of order four with allocated sequences
+    WHAT: apply reset
+    THEN: the polaron has an empty diagram of order zero and
+        empty order and energy sequences
+    """
+    polaron_order_four.set_starting_info(10)
+
+    polaron_order_four.reset()
+
+    assert polaron_order_four.order == 0
+    assert polaron_order_four.total_energy == 0.0
+    assert len(polaron_order_four.phonon_list) == 0
+    assert len(polaron_order_four.order_sequence) == 0
+    assert len(polaron_order_four.energy_sequence) == 0